@@ -0,0 +1,129 @@
+"""
+Database helpers for the MAGI agents' conversation memory.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Deque, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Use write-ahead logging so readers and the writer don't block each other, and
+    keep temporary tables and indices in memory.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+@lru_cache(maxsize=None)
+def get_engine(db_path: str) -> Engine:
+    """
+    Return the engine for a memory database, enabling WAL mode for SQLite.
+    All agents share one engine (and connection pool) per database.
+    """
+    engine = create_engine(
+        db_path,
+        pool_size=8,
+        max_overflow=16,
+        pool_timeout=30,
+        pool_recycle=1800,
+    )
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_writer(db_path: str) -> ThreadPoolExecutor:
+    """Return the single background writer thread for a memory database."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="magi-memory")
+
+
+class BufferedChatHistory:
+    """
+    Chat history kept in memory and written through to a SQL history in the background.
+
+    Reads are served from memory once the history has been loaded. Added messages are
+    queued on the database's writer thread; messages added while a write is pending
+    are stored together in a single transaction. Queued writes still complete at
+    interpreter exit, as the writer's thread is joined then.
+    """
+
+    def __init__(
+        self,
+        history: BaseChatMessageHistory,
+        db_path: str,
+        max_messages: Optional[int] = None,
+    ):
+        """
+        Initialise the buffered history.
+
+        Args:
+            history: The persistent (SQL) chat history
+            db_path: Database URL, selecting the writer thread
+            max_messages: Number of most recent messages kept in memory (None = all)
+        """
+        self.history = history
+        self.db_path = db_path
+        self.max_messages = max_messages
+
+        self._messages: Optional[Deque[BaseMessage]] = None
+        self._unsaved: List[BaseMessage] = []
+        self._write_queued = False
+        self._last_write: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """Return the most recent messages, reading the database only on first use."""
+        if self._messages is None:
+            self.flush()
+            with self._lock:
+                if self._messages is None:
+                    self._messages = deque(
+                        self.history.messages, maxlen=self.max_messages
+                    )
+        return list(self._messages)
+
+    def add_messages(self, messages: Sequence[BaseMessage]):
+        """Add messages in memory and queue them to be stored."""
+        with self._lock:
+            if self._messages is not None:
+                self._messages.extend(messages)
+            self._unsaved.extend(messages)
+            if not self._write_queued:
+                self._write_queued = True
+                self._last_write = get_writer(self.db_path).submit(self._write)
+
+    def _write(self):
+        """Store all messages added since the last write."""
+        with self._lock:
+            batch, self._unsaved = self._unsaved, []
+            self._write_queued = False
+        try:
+            self.history.add_messages(batch)
+        except Exception as e:
+            print(f"Warning: Failed to save message history: {e}")
+
+    def flush(self):
+        """Wait until all added messages have been stored."""
+        if self._last_write is not None:
+            self._last_write.result()
+
+    def clear(self):
+        """Remove all messages, in memory and in the database."""
+        self.flush()
+        self.history.clear()
+        with self._lock:
+            self._messages = deque(maxlen=self.max_messages)
@@ -0,0 +1,62 @@
+"""
+LLM client construction for the MAGI agents.
+"""
+
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import httpx
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_openai import ChatOpenAI
+
+from config import LM_STUDIO_MAX_CONNECTIONS
+
+
+@lru_cache(maxsize=8)
+def get_http_clients(
+    base_url: Optional[str],
+) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Return the HTTP clients used for an OpenAI-compatible endpoint.
+    Every chat and embedding model for the endpoint shares them, whatever its
+    settings, so the agents, the judge and embeddings reuse one connection pool.
+    """
+    limits = httpx.Limits(max_connections=LM_STUDIO_MAX_CONNECTIONS)
+    return httpx.Client(limits=limits), httpx.AsyncClient(limits=limits)
+
+
+@lru_cache(maxsize=32)
+def get_llm(
+    llm_provider: str,
+    llm_base_url: Optional[str],
+    model_name: str,
+    api_key: Optional[str],
+    temperature: float,
+):
+    """
+    Return the chat model for the given settings.
+    Agents with identical settings share one client, and with it one HTTP connection pool.
+    Supports both LM Studio and Google Gemini as LLM providers.
+    """
+    if llm_provider.lower() == "gemini":  # Use Google Gemini
+        if not api_key:
+            raise ValueError(
+                "Gemini API key required. Set GEMINI_API_KEY environment variable."
+            )
+
+        return ChatGoogleGenerativeAI(
+            model=model_name,
+            google_api_key=api_key,
+            temperature=temperature,
+            convert_system_message_to_human=True,  # Gemini compatibility
+        )
+
+    http_client, http_async_client = get_http_clients(llm_base_url)
+    return ChatOpenAI(
+        base_url=llm_base_url,
+        api_key=api_key or "lm-studio-local",
+        model=model_name,
+        temperature=temperature,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
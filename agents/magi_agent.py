@@ -1,10 +1,25 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
 from langchain.agents import create_agent
 from langchain_community.chat_message_histories import SQLChatMessageHistory
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+)
+
+from agents.db import BufferedChatHistory, get_engine
+from agents.llm import get_llm
+from agents.response_cache import ProximityCache
+from tools.batch_tool import get_batch_tool
+from tools.search_tool import get_search_tool
+from tools.tool_cache import SharedToolCache
 
-from tools.rag_tool import get_rag_tool
+log = logging.getLogger(__name__)
 
 
 class MagiAgent:
@@ -27,58 +42,67 @@ class MagiAgent:
         rag_collection: str,
         enable_rag: bool,
         enable_search: bool,
+        response_cache: Optional[ProximityCache] = None,
+        history_length: int = 32,
+        tool_cache: Optional[SharedToolCache] = None,
     ):
         self.name = name
         self.system_prompt = system_prompt
         self.session_id = session_id
         self.llm_provider = llm_provider.lower()
         self.prompt = system_prompt
+        self.response_cache = response_cache
 
-        # Set up memory with SQL backend
-        self.message_history = SQLChatMessageHistory(
-            session_id=session_id,
-            connection=memory_db_path,
-            table_name=name.lower().replace("-", "_"),
+        # Set up memory with SQL backend, keeping recent messages in memory and
+        # writing new ones in the background
+        self.memory_db_path = memory_db_path
+        self.history_length = history_length
+        self.message_history = BufferedChatHistory(
+            SQLChatMessageHistory(
+                session_id=session_id,
+                connection=get_engine(memory_db_path),
+                table_name=name.lower().replace("-", "_"),
+            ),
+            memory_db_path,
+            max_messages=history_length,
         )
 
-        # Initialise LLM based on provider
-        if self.llm_provider == "gemini":  # Use Google Gemini
-            gemini_api_key = api_key
-            if not gemini_api_key:
-                raise ValueError(
-                    "Gemini API key required. Set GEMINI_API_KEY environment variable."
-                )
-
-            self.llm = ChatGoogleGenerativeAI(
-                model=model_name,
-                google_api_key=gemini_api_key,
-                temperature=temperature,
-                convert_system_message_to_human=True,  # Gemini compatibility
-            )
-        else:
-            self.llm = ChatOpenAI(
-                base_url=llm_base_url,
-                api_key=api_key or "lm-studio-local",
-                model=model_name,
-                temperature=temperature,
-            )
+        # Initialise LLM based on provider (shared between identical agents)
+        self.llm = get_llm(
+            self.llm_provider, llm_base_url, model_name, api_key, temperature
+        )
 
         # Set up tools list
         self.tools = []
 
         # Add DuckDuckGo search tool if enabled
         if enable_search:
-            self.search_tool = DuckDuckGoSearchRun()
+            self.search_tool = get_search_tool()
             self.tools.append(self.search_tool)
 
-        # Add RAG tool if enabled
+        # Add RAG tool if enabled (imported here, as its dependencies are optional)
         if enable_rag:
             try:
+                from tools.rag_tool import get_rag_tool
+
                 self.rag_tool = get_rag_tool(collection_name=rag_collection)
                 self.tools.append(self.rag_tool)
             except Exception as e:
                 print(f"Failed to initialise RAG tool: {e}")
 
+        # Reuse results of identical tool calls made by other agents
+        if tool_cache is not None:
+            self.tools = [tool_cache.wrap(t) for t in self.tools]
+
+        # Let the agent run independent lookups concurrently in one call
+        if len(self.tools) > 1:
+            self.tools.append(get_batch_tool(list(self.tools)))
+            self.prompt += (
+                "\n\nWhen you need more than one independent lookup, make a single "
+                "batch_tools call containing all of them instead of calling tools "
+                "one at a time."
+            )
+
         # Create agent
         self.agent = create_agent(
             model=self.llm,
@@ -86,72 +110,288 @@ class MagiAgent:
             system_prompt=self.prompt,
         )
 
-    def respond(self, query: str, debug: bool = False):
+    def respond(
+        self,
+        query: str,
+        debug: bool = False,
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True,
+    ):
         """
         Generate a response to the query using the agent's tools and memory.
 
         Args:
             query: The user's question
             debug: If True, print detailed debugging information including search results
+                (otherwise it is only logged when DEBUG logging is enabled)
+            on_token: Optional callback receiving the response text as it is generated
+            use_cache: If False, skip cached responses (the new one is still cached)
         """
         try:
             # Get message history
-            chat_history = self.message_history.messages
-
-            # Invoke agent with history
-            response = self.agent.invoke({"messages": query, "context": chat_history})
-
-            # Debug: Print all messages to see tool calls and results
-            if debug:
-                print(f"\n{'=' * 60}")
-                print(f"DEBUG - {self.name} - Full Response Messages:")
-                print(f"{'=' * 60}")
-                for i, msg in enumerate(response["messages"]):
-                    msg_type = getattr(msg, "type", "unknown")
-                    print(f"\n[Message {i}] Type: {msg_type}")
-
-                    if msg_type == "ai":
-                        # Check for tool calls
-                        if hasattr(msg, "tool_calls") and msg.tool_calls:
-                            print(f"  Tool Calls: {len(msg.tool_calls)}")
-                            for tc in msg.tool_calls:
-                                print(f"    - Tool: {tc.get('name', 'unknown')}")
-                                print(f"      Args: {tc.get('args', {})}")
-                        if hasattr(msg, "content") and msg.content:
-                            print(f"  Content: {msg.content[:200]}...")
-
-                    elif msg_type == "tool":
-                        # This is the search result!
-                        print(f"  Tool Name: {getattr(msg, 'name', 'unknown')}")
-                        print("  Tool Result:")
-                        print(f"    {getattr(msg, 'content', 'No content')[:500]}...")
-
-                    elif msg_type == "human":
-                        print(f"  Content: {getattr(msg, 'content', 'No content')}")
-                print(f"{'=' * 60}\n")
-
-            # Retrieve final agent response
+            chat_history = self._load_history()
+            context = self._history_key(chat_history)
+
+            # Serve semantically repeated queries in the same context from the cache
+            cached = self._cached_response(query, context) if use_cache else None
+            if cached is not None:
+                return cached
+
+            # Stream agent run with history, keeping only the final state
+            response = None
+            for mode, chunk in self.agent.stream(
+                {"messages": query, "context": chat_history},
+                stream_mode=self._stream_modes(on_token),
+            ):
+                response = self._handle_chunk(mode, chunk, response, on_token)
+
+            return self._handle_response(query, response, debug, context)
+        except Exception as e:
+            return self._error_response(e)
+
+    async def arespond(
+        self,
+        query: str,
+        debug: bool = False,
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True,
+    ):
+        """
+        Asynchronous version of respond(), allowing agents to be queried concurrently.
+
+        Args:
+            query: The user's question
+            debug: If True, print detailed debugging information including search results
+                (otherwise it is only logged when DEBUG logging is enabled)
+            on_token: Optional callback receiving the response text as it is generated
+            use_cache: If False, skip cached responses (the new one is still cached)
+        """
+        try:
+            # SQLite history is synchronous, so read it off the event loop
+            chat_history = await asyncio.to_thread(self._load_history)
+            context = self._history_key(chat_history)
+
+            cached = None
+            if use_cache:
+                cached = await asyncio.to_thread(self._cached_response, query, context)
+            if cached is not None:
+                return cached
+
+            # Stream agent run with history, keeping only the final state
+            response = None
+            async for mode, chunk in self.agent.astream(
+                {"messages": query, "context": chat_history},
+                stream_mode=self._stream_modes(on_token),
+            ):
+                response = self._handle_chunk(mode, chunk, response, on_token)
+
+            return await asyncio.to_thread(
+                self._handle_response, query, response, debug, context
+            )
+        except Exception as e:
+            return self._error_response(e)
+
+    def build_messages(self, query: str) -> List[BaseMessage]:
+        """Build the LLM input for answering the query without tools."""
+        return [
+            SystemMessage(content=self.prompt),
+            *self._load_history(),
+            HumanMessage(content=query),
+        ]
+
+    @staticmethod
+    async def abatch_respond(
+        agents: List["MagiAgent"], query: str, debug: bool = False
+    ) -> List[dict]:
+        """
+        Answer a query with several tool-less agents sharing one LLM, submitting all
+        their prompts as a single batch instead of running each agent separately.
+
+        Args:
+            agents: Agents without tools, all using the same LLM
+            query: The user's question
+            debug: If True, print detailed debugging information
+
+        Returns:
+            Response dicts, in the same order as the agents
+        """
+        responses: List[Optional[dict]] = [None] * len(agents)
+        contexts = [
+            agent._history_key(await asyncio.to_thread(agent._load_history))
+            for agent in agents
+        ]
+
+        # Serve semantically repeated queries in the same context from the cache
+        pending = []
+        for i, agent in enumerate(agents):
+            cached = await asyncio.to_thread(
+                agent._cached_response, query, contexts[i]
+            )
+            if cached is not None:
+                responses[i] = cached
+            else:
+                pending.append(i)
+        if not pending:
+            return responses
+
+        try:
+            prompts = [
+                await asyncio.to_thread(agents[i].build_messages, query)
+                for i in pending
+            ]
+            results = await agents[0].llm.abatch(prompts, return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(pending)
+            prompts = [[]] * len(pending)
+
+        for i, prompt, result in zip(pending, prompts, results):
+            agent = agents[i]
+            if isinstance(result, Exception):
+                responses[i] = agent._error_response(result)
+                continue
+            try:
+                responses[i] = await asyncio.to_thread(
+                    agent._handle_response,
+                    query,
+                    {"messages": [*prompt[1:], result]},
+                    debug,
+                    contexts[i],
+                )
+            except Exception as e:
+                responses[i] = agent._error_response(e)
+        return responses
+
+    @staticmethod
+    def _stream_modes(on_token: Optional[Callable[[str], None]]) -> list:
+        """Stream full agent states, plus LLM tokens when a callback wants them."""
+        return ["values", "messages"] if on_token else ["values"]
+
+    @staticmethod
+    def _handle_chunk(mode: str, chunk, state: Optional[dict], on_token):
+        """Forward streamed tokens to the callback and return the latest agent state."""
+        if mode == "values":
+            return chunk
+
+        message, _ = chunk
+        if isinstance(message, AIMessageChunk) and message.text:
+            on_token(message.text)
+        return state
+
+    def _handle_response(
+        self, query: str, response: dict, debug: bool, context: tuple = ()
+    ):
+        """
+        Extract the final answer from an agent run and save it to history.
+        The answer is cached for the conversation context it was given, identified
+        by _history_key().
+        """
+        # Debug: Print all messages to see tool calls and results
+        if debug or log.isEnabledFor(logging.DEBUG):
+            self._log_debug(response["messages"], echo=debug)
+
+        # Retrieve final agent response (normally the last message of the run)
+        final_ai_response = response["messages"][-1]
+        if getattr(final_ai_response, "type", None) != "ai":
             final_ai_response = next(
                 m
                 for m in reversed(response["messages"])
                 if getattr(m, "type", None) == "ai"
             )
 
-            # Save to history
-            self.message_history.add_user_message(query)
-            self.message_history.add_ai_message(final_ai_response.text)
+        # Save to history
+        self._save_exchange(query, final_ai_response.text)
 
-            return {
-                "agent": self.name,
-                "response": final_ai_response.text,
-                "success": True,
-            }
-        except Exception as e:
-            return {
-                "agent": self.name,
-                "response": f"Error: {str(e)}",
-                "success": False,
-            }
+        result = {
+            "agent": self.name,
+            "response": final_ai_response.text,
+            "success": True,
+        }
+        if self.response_cache is not None:
+            self.response_cache.store(self.name, query, (context, result))
+        return result
+
+    @staticmethod
+    def _history_key(messages: List[BaseMessage]) -> tuple:
+        """Identify the conversation preceding a query, for cache validation."""
+        return tuple((m.type, m.text) for m in messages)
+
+    def _cached_response(self, query: str, context: tuple = ()) -> Optional[dict]:
+        """
+        Return a cached response for a similar query asked after the same
+        conversation, or None on a miss. Answers to follow-up questions such as
+        "Why?" depend on what was said before, not only on the query.
+        """
+        if self.response_cache is None:
+            return None
+
+        cached = self.response_cache.lookup(self.name, query)
+        if cached is None:
+            return None
+
+        cached_context, cached = cached
+        if cached_context != context:
+            return None
+
+        # Keep the conversation history consistent with what the user saw
+        self._save_exchange(query, cached["response"])
+        return {**cached, "cache_hit": True}
+
+    def _save_exchange(self, query: str, answer: str):
+        """Queue a query and its answer to be stored in message history."""
+        self.message_history.add_messages(
+            [HumanMessage(content=query), AIMessage(content=answer)]
+        )
+
+    def _load_history(self):
+        """Return the most recent messages of the conversation."""
+        return self.message_history.messages
+
+    def _error_response(self, error: Exception):
+        """Build the response dict returned when the agent fails."""
+        return {
+            "agent": self.name,
+            "response": f"Error: {str(error)}",
+            "success": False,
+        }
+
+    def _log_debug(self, messages, echo: bool):
+        """
+        Log all messages of an agent run, including tool calls and results.
+        Messages are printed when echo is True, and sent to the module logger otherwise.
+        """
+
+        def emit(msg, *args):
+            if echo:
+                print(msg % args)
+            else:
+                log.debug(msg, *args)
+
+        emit("\n%s", "=" * 60)
+        emit("DEBUG - %s - Full Response Messages:", self.name)
+        emit("%s", "=" * 60)
+        for i, msg in enumerate(messages):
+            msg_type = getattr(msg, "type", "unknown")
+            emit("\n[Message %d] Type: %s", i, msg_type)
+
+            if msg_type == "ai":
+                # Check for tool calls
+                if hasattr(msg, "tool_calls") and msg.tool_calls:
+                    emit("  Tool Calls: %d", len(msg.tool_calls))
+                    for tc in msg.tool_calls:
+                        emit("    - Tool: %s", tc.get("name", "unknown"))
+                        emit("      Args: %s", tc.get("args", {}))
+                if hasattr(msg, "content") and msg.content:
+                    emit("  Content: %.200s...", msg.content)
+
+            elif msg_type == "tool":
+                # This is the search result!
+                emit("  Tool Name: %s", getattr(msg, "name", "unknown"))
+                emit("  Tool Result:")
+                emit("    %.500s...", getattr(msg, "content", "No content"))
+
+            elif msg_type == "human":
+                emit("  Content: %s", getattr(msg, "content", "No content"))
+        emit("%s\n", "=" * 60)
 
     def clear_memory(self):
         """Clear the agent's conversation history."""
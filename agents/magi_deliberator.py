@@ -1,11 +1,20 @@
-from typing import Dict, List
+import asyncio
+import traceback
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import tiktoken
 
 from langchain_community.chat_message_histories import SQLChatMessageHistory
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import HumanMessagePromptTemplate
 from pydantic import BaseModel, Field
 
+from agents.db import BufferedChatHistory, get_engine
+from agents.llm import get_llm
+from agents.response_cache import ProximityCache
+from config import DEBUG
+
 
 # Pydantic models for structured output
 class AgentEvaluation(BaseModel):
@@ -30,6 +39,21 @@ class DeliberationResult(BaseModel):
     )
 
 
+class Deliberation(BaseModel):
+    """Evaluations, synthesis and final answer produced in a single LLM call"""
+
+    evaluations: List[AgentEvaluation] = Field(
+        description="Individual agent evaluations"
+    )
+    synthesis: str = Field(description="Overall analysis and recommendation")
+    voting_result: str = Field(
+        description="Which response(s) were most valuable and why"
+    )
+    final_answer: str = Field(
+        description="Final answer to the question incorporating the best elements of the responses"
+    )
+
+
 class FinalResult(BaseModel):
     """Final result output from the deliberation process"""
 
@@ -39,6 +63,79 @@ class FinalResult(BaseModel):
     final_answer: str = Field(description="The synthesized final answer")
 
 
+# Prompt for facilitating vote
+VOTING_SYSTEM = SystemMessage(
+    content="""You are facilitating a voting process among AI agents.
+            Based on the responses and your analysis, determine which approach or answer is most appropriate.
+            Consider all perspectives but make a clear decision."""
+)
+VOTING_HUMAN = HumanMessagePromptTemplate.from_template(
+    """Question: {question}
+
+            Responses with scores:
+            {scored_responses}
+
+            Based on the analysis, which response or combination of responses best answers the question?
+            Provide a final synthesized answer that incorporates the best elements."""
+)
+
+# Prompt for evaluating responses and synthesising the answer in one call
+DELIBERATION_SYSTEM = SystemMessage(
+    content="""You are an independent judge evaluating responses from a council of AI agents.
+            Each agent has a different perspective: scientific, strategic, and ethical.
+
+            Your task is to:
+            1. Analyze each agent's response for quality, relevance, and insight
+            2. Identify strengths and weaknesses
+            3. Note any contradictions or complementary points
+            4. Provide a score (1-10) for each response based on:
+            - Relevance to the question
+            - Depth of analysis
+            - Use of evidence/reasoning
+            - Practical value
+            5. Decide which response or combination of responses best answers the question
+            6. Write a final answer that incorporates the best elements
+
+            Be objective and fair in your evaluation, but make a clear decision."""
+)
+DELIBERATION_HUMAN = HumanMessagePromptTemplate.from_template(
+    """Question: {question}
+
+            Agent Responses:
+            {responses}
+
+            Please provide:
+            1. Individual scores and brief reasoning for each agent
+            2. A synthesis of the key insights, agreements and disagreements
+            3. Which response(s) were most valuable and why
+            4. A final synthesized answer to the question"""
+)
+
+# Prompt blocks for the usual council of three agents, compiled once
+_RESPONSE_TEMPLATE = "Agent: {}\nResponse: {}"
+_FORMAT_RESPONSE = _RESPONSE_TEMPLATE.format
+_FORMAT_THREE_RESPONSES = "\n\n".join([_RESPONSE_TEMPLATE] * 3).format
+_FORMAT_THREE_SCORED_RESPONSES = "\n\n".join(
+    ["Agent: {}\nScore: {}/10\nReasoning: {}\nFull Response: {}"] * 3
+).format
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: str) -> Optional[tiktoken.Encoding]:
+    """
+    Return the tokeniser for a model, falling back to cl100k_base for local models.
+    Returns None when no tokeniser can be loaded (tiktoken downloads them on first use).
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"Warning: Tokeniser unavailable, estimating response lengths: {e}")
+        return None
+
+
 # Deliberator agent for evaluating and aggregating responses
 class DeliberatorAgent:
     """
@@ -55,248 +152,662 @@ class DeliberatorAgent:
         temperature: float,
         session_id: str,
         memory_db_path: str,
+        response_cache: Optional[ProximityCache] = None,
+        unanimity_threshold: float = 0.9,
+        max_tokens_per_response: Optional[int] = 800,
+        strict_validation: bool = False,
     ):
         self.llm_provider = llm_provider.lower()
+        self.model_name = model_name
+        self.max_tokens_per_response = max_tokens_per_response
+        self.strict_validation = strict_validation
         self.session_id = session_id
+        self.response_cache = response_cache
+        self.unanimity_threshold = unanimity_threshold
+
+        # Set up memory with SQL backend (written in the background)
+        self.memory_db_path = memory_db_path
+        self.message_history = BufferedChatHistory(
+            SQLChatMessageHistory(
+                session_id=session_id,
+                connection=get_engine(memory_db_path),
+                table_name="deliberator",
+            ),
+            memory_db_path,
+        )
+
+        # Initialise LLM based on provider (shared between identical agents)
+        self.llm = get_llm(
+            self.llm_provider, llm_base_url, model_name, api_key, temperature
+        )
 
-        # Set up memory with SQL backend
-        self.message_history = SQLChatMessageHistory(
-            session_id=session_id,
-            connection=memory_db_path,
-            table_name="deliberator",
+        # Prompts are built once at import time and shared by all instances
+        self.voting_system = VOTING_SYSTEM
+        self.voting_human = VOTING_HUMAN
+        self.deliberation_system = DELIBERATION_SYSTEM
+        self.deliberation_human = DELIBERATION_HUMAN
+
+        # Structured output LLM for the combined deliberation
+        self.deliberation_llm = self._structured_llm(Deliberation)
+
+    def _structured_llm(self, schema: type[BaseModel]):
+        """
+        Bind the LLM to return output following the given Pydantic model.
+        OpenAI-compatible servers are asked for schema-constrained JSON (response_format),
+        so the output always parses without falling back to tool calling. It is returned
+        as a plain dict, and only validated in strict mode (see _parse_deliberation).
+        """
+        if self.llm_provider == "gemini":
+            return self.llm.with_structured_output(schema)
+        return self.llm.with_structured_output(
+            schema.model_json_schema(), method="json_schema"
         )
 
-        # Initialise LLM based on provider
-        if self.llm_provider == "gemini":  # Use Google Gemini
-            gemini_api_key = api_key
-            if not gemini_api_key:
-                raise ValueError(
-                    "Gemini API key required. Set GEMINI_API_KEY environment variable."
+    def _parse_deliberation(self, output) -> Deliberation:
+        """
+        Turn the structured LLM output into a Deliberation.
+        The schema is already enforced by the server, so unless strict validation is
+        enabled the model is built without running Pydantic validation, apart from
+        keeping scores within their 1-10 range.
+        """
+        if isinstance(output, Deliberation):
+            return output
+        if self.strict_validation:
+            return Deliberation.model_validate(output)
+
+        return Deliberation.model_construct(
+            evaluations=[
+                AgentEvaluation.model_construct(
+                    agent=str(e.get("agent", "Unknown")),
+                    score=self._clamp_score(e.get("score", "N/A")),
+                    reasoning=str(e.get("reasoning", "")),
                 )
+                for e in output.get("evaluations") or []
+            ],
+            synthesis=str(output.get("synthesis", "")),
+            voting_result=str(output.get("voting_result", "")),
+            final_answer=str(output["final_answer"]),
+        )
 
-            self.llm = ChatGoogleGenerativeAI(
-                model=model_name,
-                google_api_key=gemini_api_key,
-                temperature=temperature,
-                convert_system_message_to_human=True,  # Gemini compatibility
-            )
-        else:
-            self.llm = ChatOpenAI(
-                base_url=llm_base_url,
-                api_key=api_key,
-                model=model_name,
-                temperature=temperature,
+    def _run_deliberation(
+        self, question: str, responses: List[Dict], formatted: Optional[str] = None
+    ) -> Deliberation:
+        """Run the combined deliberation call, raising on failure."""
+        return self._parse_deliberation(
+            self.deliberation_llm.invoke(
+                self._deliberation_messages(question, responses, formatted)
             )
-
-        # Prompt for evaluating responses
-        self.evaluation_prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """You are an independent judge evaluating responses from a council of AI agents.
-                    Each agent has a different perspective: scientific, strategic, and ethical.
-
-                    Your task is to:
-                    1. Analyze each agent's response for quality, relevance, and insight
-                    2. Identify strengths and weaknesses
-                    3. Note any contradictions or complementary points
-                    4. Provide a score (1-10) for each response based on:
-                    - Relevance to the question
-                    - Depth of analysis
-                    - Use of evidence/reasoning
-                    - Practical value
-
-                    Be objective and fair in your evaluation.""",
-                ),
-                (
-                    "human",
-                    """Question: {question}
-
-                    Agent Responses:
-                    {responses}
-
-                    Please evaluate each response and provide:
-                    1. Individual scores and brief reasoning for each agent
-                    2. Key insights from each perspective
-                    3. Areas of agreement and disagreement
-                    4. A synthesized recommendation""",
-                ),
-            ]
         )
 
-        # Create structured output chain for evaluations
-        self.evaluation_chain = (
-            self.evaluation_prompt | self.llm.with_structured_output(DeliberationResult)
+    async def _arun_deliberation(
+        self, question: str, responses: List[Dict], formatted: Optional[str] = None
+    ) -> Deliberation:
+        """Asynchronous version of _run_deliberation()."""
+        return self._parse_deliberation(
+            await self.deliberation_llm.ainvoke(
+                self._deliberation_messages(question, responses, formatted)
+            )
         )
 
-        # Prompt for facilitating vote
-        self.voting_prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """You are facilitating a voting process among AI agents.
-                    Based on the responses and your analysis, determine which approach or answer is most appropriate.
-                    Consider all perspectives but make a clear decision.""",
-                ),
-                (
-                    "human",
-                    """Question: {question}
+    @staticmethod
+    def _clamp_score(score):
+        """Bring a numeric score within 1-10, leaving other values as they are."""
+        if isinstance(score, (int, float)) and not isinstance(score, bool):
+            return min(max(int(score), 1), 10)
+        return score
 
-                    Responses with scores:
-                    {scored_responses}
+    def deliberate(
+        self,
+        question: str,
+        responses: List[Dict],
+        *,
+        formatted: Optional[str] = None,
+        response_map: Optional[Dict[str, str]] = None,
+    ) -> FinalResult:
+        """
+        Evaluate all agent responses and synthesise the final answer in a single LLM call.
+        Returns a structured FinalResult object.
 
-                    Based on the analysis, which response or combination of responses best answers the question?
-                    Provide a final synthesized answer that incorporates the best elements.""",
-                ),
-            ]
-        )
+        Args:
+            question: The user's question
+            responses: Agent response dicts
+            formatted: The responses already formatted by _index_responses(), if available
+            response_map: The agent name to response map from _index_responses(), if available
+        """
+        try:
+            return self._final_result(
+                self._run_deliberation(question, responses, formatted)
+            )
+
+        except Exception as e:
+            # Fall back to an unscored synthesis so the user still gets an answer
+            evaluation = self._evaluation_error(responses, e)
+            final_answer = self.synthesise_final_answer(
+                question,
+                responses,
+                self._unscored_evaluation(),
+                response_map=response_map,
+            )
+            return FinalResult(evaluation=evaluation, final_answer=final_answer)
+
+    async def adeliberate(
+        self,
+        question: str,
+        responses: List[Dict],
+        *,
+        formatted: Optional[str] = None,
+        response_map: Optional[Dict[str, str]] = None,
+    ) -> FinalResult:
+        """
+        Asynchronous version of deliberate().
+        """
+        try:
+            return self._final_result(
+                await self._arun_deliberation(question, responses, formatted)
+            )
+
+        except Exception as e:
+            evaluation = self._evaluation_error(responses, e)
+            final_answer = await self.asynthesise_final_answer(
+                question,
+                responses,
+                self._unscored_evaluation(),
+                response_map=response_map,
+            )
+            return FinalResult(evaluation=evaluation, final_answer=final_answer)
 
     def evaluate_responses(
-        self, question: str, responses: List[Dict]
+        self,
+        question: str,
+        responses: List[Dict],
+        *,
+        formatted: Optional[str] = None,
     ) -> DeliberationResult:
         """
         Evaluate all agent responses and provide scoring.
         Returns a structured DeliberationResult object.
+        The final answer of the combined call is discarded, and no answer is
+        synthesised when it fails.
         """
-        # Format responses for evaluation
-        formatted_responses = "\n\n".join(
-            [
-                f"Agent: {r['agent']}\nResponse: {r['response']}"
-                for r in responses
-                if r["success"]
+        try:
+            return self._final_result(
+                self._run_deliberation(question, responses, formatted)
+            ).evaluation
+        except Exception as e:
+            return self._evaluation_error(responses, e)
+
+    async def aevaluate_responses(
+        self,
+        question: str,
+        responses: List[Dict],
+        *,
+        formatted: Optional[str] = None,
+    ) -> DeliberationResult:
+        """
+        Asynchronous version of evaluate_responses().
+        """
+        try:
+            deliberation = await self._arun_deliberation(question, responses, formatted)
+            return self._final_result(deliberation).evaluation
+        except Exception as e:
+            return self._evaluation_error(responses, e)
+
+    def synthesise_final_answer(
+        self,
+        question: str,
+        responses: List[Dict],
+        evaluation: DeliberationResult,
+        *,
+        response_map: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """
+        Create a final synthesised answer based on all responses and evaluation.
+        A response_map built by _response_map() can be passed to avoid rebuilding it.
+        """
+        scored_responses = self._format_scored_responses(
+            responses, evaluation, response_map
+        )
+
+        try:
+            messages = [
+                self.voting_system,
+                self.voting_human.format(
+                    question=question, scored_responses=scored_responses
+                ),
             ]
+            result = self.llm.invoke(messages)
+
+            return self._result_content(result)
+        except Exception as e:
+            return self._synthesis_error(e)
+
+    async def asynthesise_final_answer(
+        self,
+        question: str,
+        responses: List[Dict],
+        evaluation: DeliberationResult,
+        *,
+        response_map: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """
+        Asynchronous version of synthesise_final_answer().
+        """
+        scored_responses = self._format_scored_responses(
+            responses, evaluation, response_map
         )
 
         try:
-            # Get message history for context
-            chat_history = self.message_history.messages
-
-            # Use structured output chain to get Pydantic model directly
-            evaluation = self.evaluation_chain.invoke(
-                {
-                    "question": question,
-                    "responses": formatted_responses,
-                    "chat_history": chat_history,
-                }
+            messages = [
+                self.voting_system,
+                self.voting_human.format(
+                    question=question, scored_responses=scored_responses
+                ),
+            ]
+            result = await self.llm.ainvoke(messages)
+
+            return self._result_content(result)
+        except Exception as e:
+            return self._synthesis_error(e)
+
+    def process_magi_decision(
+        self, question: str, responses: List[Dict], use_cache: bool = True
+    ) -> FinalResult:
+        """
+        Complete evaluation and synthesis process.
+        Returns a structured FinalResult object.
+
+        Args:
+            question: The user's question
+            responses: Agent response dicts
+            use_cache: If False, skip cached decisions (the new one is still cached)
+        """
+        self._print_header("MAGI DELIBERATION")
+
+        # With fewer than two successful responses there is nothing to deliberate
+        result = self._trivial_decision(responses)
+        if result is None:
+            # Identical agent responses to a similar question need no new deliberation
+            cached = self._cached_decision(question, responses) if use_cache else None
+            if cached is not None:
+                return cached
+
+            # Evaluate responses and generate final answer in one call, unless
+            # the agents already agree
+            formatted, response_map = self._index_responses(responses)
+            result = self._unanimous_decision(responses) or self.deliberate(
+                question, responses, formatted=formatted, response_map=response_map
             )
+            self._cache_decision(question, responses, result)
 
-            return evaluation
+        self._print_evaluation(result.evaluation)
 
-        except Exception as e:
-            print(f"\nDEBUG: Error in evaluate_responses: {str(e)}")
-            print(f"DEBUG: Error type: {type(e).__name__}")
-            import traceback
+        # Store final answer in message history
+        self._save_exchange(question, result.final_answer)
 
-            traceback.print_exc()
+        self._print_final_answer(result.final_answer)
+        return result
+
+    async def aprocess_magi_decision(
+        self, question: str, responses: List[Dict], use_cache: bool = True
+    ) -> FinalResult:
+        """
+        Asynchronous version of process_magi_decision().
+        """
+        self._print_header("MAGI DELIBERATION")
+
+        result = self._trivial_decision(responses)
+        if result is None:
+            cached = None
+            if use_cache:
+                cached = await asyncio.to_thread(
+                    self._cached_decision, question, responses
+                )
+            if cached is not None:
+                return cached
+
+            formatted, response_map = self._index_responses(responses)
+            result = self._unanimous_decision(responses) or await self.adeliberate(
+                question, responses, formatted=formatted, response_map=response_map
+            )
+            await asyncio.to_thread(self._cache_decision, question, responses, result)
+
+        self._print_evaluation(result.evaluation)
+
+        # Store final answer in message history
+        await asyncio.to_thread(self._save_exchange, question, result.final_answer)
+
+        self._print_final_answer(result.final_answer)
+        return result
+
+    @staticmethod
+    def _trivial_decision(responses: List[Dict]) -> Optional[FinalResult]:
+        """
+        Return a result without deliberating when fewer than two agents answered
+        successfully, or None when there are responses to compare.
+        """
+        successful = [r for r in responses if r["success"]]
+        if len(successful) > 1:
+            return None
+
+        if not successful:
+            print("\n(No successful responses - deliberation skipped)")
+            return FinalResult(
+                evaluation=DeliberationResult(
+                    evaluations=[], synthesis="No responses", voting_result="None"
+                ),
+                final_answer="No agent was able to answer the question.",
+            )
 
-            # Return a default DeliberationResult on error
-            return DeliberationResult(
+        print("\n(Single successful response - deliberation skipped)")
+        response = successful[0]
+        return FinalResult(
+            evaluation=DeliberationResult(
                 evaluations=[
                     AgentEvaluation(
-                        agent=r["agent"], score=1, reasoning="Evaluation failed."
+                        agent=response["agent"],
+                        score=10,
+                        reasoning="Only successful response.",
                     )
-                    for r in responses
-                    if r["success"]
                 ],
-                synthesis=f"Error during evaluation: {str(e)}",
-                voting_result="Error",
-            )
+                synthesis=response["response"],
+                voting_result=f"Only {response['agent']} responded",
+            ),
+            final_answer=response["response"],
+        )
 
-    def synthesise_final_answer(
-        self, question: str, responses: List[Dict], evaluation: DeliberationResult
-    ) -> str:
+    def _unanimous_decision(self, responses: List[Dict]) -> Optional[FinalResult]:
         """
-        Create a final synthesised answer based on all responses and evaluation.
+        Return a result without deliberating when all successful agent responses are
+        near-identical (word trigram Jaccard similarity above the unanimity threshold),
+        or None when there is something to deliberate.
         """
-        # Build scored responses by combining evaluation scores with actual responses
-        scored_items = []
+        successful = [r for r in responses if r["success"]]
+        if len(successful) < 2:
+            return None
+
+        shingles = [self._shingles(r["response"]) for r in successful]
+        for i, a in enumerate(shingles):
+            for b in shingles[i + 1 :]:
+                union = len(a | b)
+                if union and len(a & b) / union <= self.unanimity_threshold:
+                    return None
+
+        print("\n(Unanimous responses - deliberation skipped)")
+        final_answer = max((r["response"] for r in successful), key=len)
+        return FinalResult(
+            evaluation=DeliberationResult(
+                evaluations=[
+                    AgentEvaluation(
+                        agent=r["agent"],
+                        score=9,
+                        reasoning="All agents gave the same answer.",
+                    )
+                    for r in successful
+                ],
+                synthesis=final_answer,
+                voting_result="Unanimous",
+            ),
+            final_answer=final_answer,
+        )
 
-        # Create a map of agent names to their responses
-        response_map = {r["agent"]: r["response"] for r in responses if r["success"]}
+    @staticmethod
+    def _shingles(text: str) -> set:
+        """Return the word trigrams of a normalised text."""
+        words = "".join(c if c.isalnum() else " " for c in text.lower()).split()
+        if len(words) < 3:
+            return {tuple(words)}
+        return {tuple(words[i : i + 3]) for i in range(len(words) - 2)}
 
-        # Combine with evaluation scores if available
-        if evaluation.evaluations:
-            for eval_item in evaluation.evaluations:
-                agent_name = eval_item.agent
-                agent_response = response_map.get(agent_name, "No response available")
-                scored_items.append(
-                    f"Agent: {agent_name}\n"
-                    f"Score: {eval_item.score}/10\n"
-                    f"Reasoning: {eval_item.reasoning}\n"
-                    f"Full Response: {agent_response}"
-                )
-        else:
-            # If no evaluations available, just use the raw responses
-            for r in responses:
-                if r["success"]:
-                    scored_items.append(
-                        f"Agent: {r['agent']}\n"
-                        f"Score: N/A\n"
-                        f"Reasoning: Evaluation not available\n"
-                        f"Full Response: {r['response']}"
-                    )
+    @staticmethod
+    def _responses_key(responses: List[Dict]) -> tuple:
+        """Identify a set of agent responses for cache validation."""
+        return tuple((r["agent"], r["response"]) for r in responses if r["success"])
 
-        scored_responses = "\n\n".join(scored_items)
+    def _cached_decision(
+        self, question: str, responses: List[Dict]
+    ) -> Optional[FinalResult]:
+        """
+        Return the cached result of a previous deliberation on a similar question
+        with identical agent responses, or None on a miss.
+        """
+        if self.response_cache is None:
+            return None
 
-        try:
-            messages = self.voting_prompt.format_messages(
-                question=question, scored_responses=scored_responses
-            )
-            result = self.llm.invoke(messages)
+        cached = self.response_cache.lookup("deliberator", question)
+        if cached is None:
+            return None
 
-            # Extract content from the result
-            if hasattr(result, "content"):
-                return result.content
-            else:
-                return str(result)
-        except Exception as e:
-            print(f"\nDEBUG: Error in synthesise_final_answer: {str(e)}")
-            print(f"DEBUG: Error type: {type(e).__name__}")
-            import traceback
+        responses_key, result = cached
+        if responses_key != self._responses_key(responses):
+            return None
 
-            traceback.print_exc()
-            return f"Error synthesizing answer: {str(e)}"
+        print("\n(Cached deliberation)")
+        self._print_evaluation(result.evaluation)
+        self._save_exchange(question, result.final_answer)
+        self._print_final_answer(result.final_answer)
+        return result
 
-    def process_magi_decision(
-        self, question: str, responses: List[Dict]
-    ) -> FinalResult:
+    def _cache_decision(
+        self, question: str, responses: List[Dict], result: FinalResult
+    ):
+        """Cache a successful deliberation result."""
+        if self.response_cache is None:
+            return
+        if result.evaluation.voting_result == "Error" or result.final_answer.startswith(
+            "Error synthesizing answer"
+        ):
+            return
+
+        self.response_cache.store(
+            "deliberator", question, (self._responses_key(responses), result)
+        )
+
+    def _save_exchange(self, question: str, answer: str):
+        """Queue a question and its answer to be stored in message history."""
+        self.message_history.add_messages(
+            [HumanMessage(content=question), AIMessage(content=answer)]
+        )
+
+    def _deliberation_messages(
+        self, question: str, responses: List[Dict], formatted: Optional[str] = None
+    ) -> list:
+        """Build the messages of the combined deliberation call."""
+        if formatted is None:
+            formatted = self._format_responses(responses)
+        return [
+            self.deliberation_system,
+            self.deliberation_human.format(question=question, responses=formatted),
+        ]
+
+    def _truncate(self, text: str) -> str:
         """
-        Complete evaluation and synthesis process.
-        Returns a structured FinalResult object.
+        Shorten a response to the per-response token budget, keeping its beginning
+        and its conclusion, so that verbose agents don't inflate the prompt.
+        """
+        budget = self.max_tokens_per_response
+        # Never more tokens than UTF-8 bytes
+        if budget is None or len(text.encode()) <= budget:
+            return text
+
+        head = budget * 3 // 4
+        tail = budget - head
+
+        encoding = _get_encoding(self.model_name)
+        if encoding is None:
+            # Roughly four characters per token
+            if len(text) <= budget * 4:
+                return text
+            return text[: head * 4] + "\n…\n" + (text[-tail * 4 :] if tail else "")
+
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= budget:
+            return text
+        return (
+            encoding.decode(tokens[:head])
+            + "\n…\n"
+            + (encoding.decode(tokens[-tail:]) if tail else "")
+        )
+
+    def _index_responses(self, responses: List[Dict]) -> Tuple[str, Dict[str, str]]:
+        """
+        Format successful agent responses for the evaluation prompt and map agent
+        names to their responses, in a single pass over the responses.
         """
-        print("\n" + "=" * 80)
-        print("MAGI DELIBERATION")
-        print("=" * 80)
+        response_map = {}
+        fields = []
+        for r in responses:
+            if r["success"]:
+                response_map[r["agent"]] = r["response"]
+                fields += (r["agent"], self._truncate(r["response"]))
+
+        if len(fields) == 6:
+            return _FORMAT_THREE_RESPONSES(*fields), response_map
+        formatted = "\n\n".join(
+            _FORMAT_RESPONSE(agent, response)
+            for agent, response in zip(fields[::2], fields[1::2])
+        )
+        return formatted, response_map
 
-        # Evaluate responses (returns structured Pydantic model)
-        evaluation = self.evaluate_responses(question, responses)
+    def _format_responses(self, responses: List[Dict]) -> str:
+        """Format successful agent responses for the evaluation prompt."""
+        return self._index_responses(responses)[0]
 
-        # Print the evaluation scores
-        if evaluation.evaluations:
-            print("\nIndividual Scores:")
-            for eval_item in evaluation.evaluations:
-                print(f"  {eval_item.agent}: {eval_item.score}/10")
-                print(f"    {eval_item.reasoning}")
+    @staticmethod
+    def _response_map(responses: List[Dict]) -> Dict[str, str]:
+        """Map agent names to their successful responses."""
+        return {r["agent"]: r["response"] for r in responses if r["success"]}
+
+    def _format_scored_responses(
+        self,
+        responses: List[Dict],
+        evaluation: DeliberationResult,
+        response_map: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Combine evaluation scores with the actual agent responses."""
+        # If no evaluations available, just use the raw responses
+        if not evaluation.evaluations:
+            return "\n\n".join(
+                f"Agent: {r['agent']}\n"
+                f"Score: N/A\n"
+                f"Reasoning: Evaluation not available\n"
+                f"Full Response: {self._truncate(r['response'])}"
+                for r in responses
+                if r["success"]
+            )
+
+        # Combine evaluation scores with the actual responses
+        if response_map is None:
+            response_map = self._response_map(responses)
+        if len(evaluation.evaluations) == 3:
+            return _FORMAT_THREE_SCORED_RESPONSES(
+                *(
+                    field
+                    for e in evaluation.evaluations
+                    for field in (
+                        e.agent,
+                        e.score,
+                        e.reasoning,
+                        self._truncate(
+                            response_map.get(e.agent, "No response available")
+                        ),
+                    )
+                )
+            )
+
+        return "\n\n".join(
+            f"Agent: {e.agent}\n"
+            f"Score: {e.score}/10\n"
+            f"Reasoning: {e.reasoning}\n"
+            f"Full Response: "
+            f"{self._truncate(response_map.get(e.agent, 'No response available'))}"
+            for e in evaluation.evaluations
+        )
+
+    @staticmethod
+    def _result_content(result) -> str:
+        """Extract content from an LLM result."""
+        if hasattr(result, "content"):
+            return result.content
         else:
-            print("\nIndividual Scores: Not available")
+            return str(result)
+
+    @staticmethod
+    def _final_result(deliberation: Deliberation) -> FinalResult:
+        """Split a combined deliberation into its evaluation and final answer."""
+        return FinalResult(
+            evaluation=DeliberationResult(
+                evaluations=deliberation.evaluations,
+                synthesis=deliberation.synthesis,
+                voting_result=deliberation.voting_result,
+            ),
+            final_answer=deliberation.final_answer,
+        )
 
-        print("\nSynthesis:")
-        print(evaluation.synthesis)
+    @staticmethod
+    def _unscored_evaluation() -> DeliberationResult:
+        """Return an empty evaluation, for synthesising from the raw responses."""
+        return DeliberationResult(evaluations=[], synthesis="", voting_result="")
+
+    @staticmethod
+    def _evaluation_error(responses: List[Dict], e: Exception) -> DeliberationResult:
+        """Report an evaluation error and return a default DeliberationResult."""
+        print(
+            f"\nDEBUG: Error in evaluate_responses: {str(e)}\n"
+            f"DEBUG: Error type: {type(e).__name__}"
+        )
+        if DEBUG:
+            traceback.print_exc()
 
-        # Generate final answer
-        final_answer = self.synthesise_final_answer(question, responses, evaluation)
+        # Return a default DeliberationResult on error
+        return DeliberationResult(
+            evaluations=[
+                AgentEvaluation(
+                    agent=r["agent"], score=1, reasoning="Evaluation failed."
+                )
+                for r in responses
+                if r["success"]
+            ],
+            synthesis=f"Error during evaluation: {str(e)}",
+            voting_result="Error",
+        )
 
-        # Store final answer in message history
-        self.message_history.add_user_message(question)
-        self.message_history.add_ai_message(final_answer)
+    @staticmethod
+    def _synthesis_error(e: Exception) -> str:
+        """Report a synthesis error and return the error message as the answer."""
+        print(
+            f"\nDEBUG: Error in synthesise_final_answer: {str(e)}\n"
+            f"DEBUG: Error type: {type(e).__name__}"
+        )
+        if DEBUG:
+            traceback.print_exc()
+        return f"Error synthesizing answer: {str(e)}"
+
+    @staticmethod
+    def _print_header(title: str):
+        rule = "=" * 80
+        print(f"\n{rule}\n{title}\n{rule}")
+
+    @staticmethod
+    def _print_evaluation(evaluation: DeliberationResult):
+        """Print the evaluation scores and synthesis."""
+        if evaluation.evaluations:
+            # One write for the whole table, however many agents there are
+            print(
+                "\nIndividual Scores:\n"
+                + "\n".join(
+                    f"  {e.agent}: {e.score}/10\n    {e.reasoning}"
+                    for e in evaluation.evaluations
+                )
+            )
+        else:
+            print("\nIndividual Scores: Not available")
 
-        print("\n" + "=" * 80)
-        print("FINAL SYNTHESISED ANSWER")
-        print("=" * 80)
-        print(final_answer)
-        print("=" * 80 + "\n")
+        print(f"\nSynthesis:\n{evaluation.synthesis}")
 
-        return FinalResult(evaluation=evaluation, final_answer=final_answer)
+    @staticmethod
+    def _print_final_answer(final_answer: str):
+        rule = "=" * 80
+        print(f"\n{rule}\nFINAL SYNTHESISED ANSWER\n{rule}\n{final_answer}\n{rule}\n")
 
     def clear_memory(self):
         """Clear the deliberator's conversation history."""
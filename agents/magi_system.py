@@ -2,32 +2,83 @@
 MAGI System - a multi-agent council with voting.
 """
 
+import asyncio
 import os
+import threading
 import uuid
 from datetime import datetime
 from typing import Dict
 
 import dotenv
+from langchain_openai import OpenAIEmbeddings
 
+from agents.llm import get_http_clients
 from agents.magi_agent import MagiAgent
 from agents.magi_deliberator import DeliberatorAgent
 from agents.personalities import get_all_personalities
+from agents.response_cache import ProximityCache
 from config import (
     AGENT_TEMPERATURE,
     GEMINI_MODEL,
+    JUDGE_MAX_TOKENS_PER_RESPONSE,
+    JUDGE_STRICT_VALIDATION,
     JUDGE_TEMPERATURE,
+    JUDGE_UNANIMITY_THRESHOLD,
     LLM_PROVIDER,
     LM_STUDIO_API_KEY,
     LM_STUDIO_MODEL,
     LM_STUDIO_URL,
     RAG_COLLECTION_NAME,
+    RAG_EMBEDDING_MODEL,
     RAG_ENABLED,
     MEMORY_DB_PATH,
+    MEMORY_HISTORY_LENGTH,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_THRESHOLD,
     SEARCH_ENABLED,
 )
+from tools.tool_cache import SharedToolCache
+
+try:
+    import uvloop  # Optional faster event loop (not available on Windows)
+except ImportError:
+    uvloop = None
 
 dotenv.load_dotenv()  # Load environment variables from .env file if present
 
+# LangSmith tracing serialises every LLM call; keep it off unless explicitly enabled
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "false")
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the event loop running synchronous calls, started once per process in a
+    background thread (a uvloop loop when uvloop is installed).
+    The loop is long-lived because the shared HTTP clients pool connections bound to
+    the loop that opened them.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            if uvloop is not None:
+                _loop = uvloop.new_event_loop()
+            else:
+                _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="magi-event-loop", daemon=True
+            ).start()
+        return _loop
+
+
+def run_async(coro):
+    """Run a coroutine to completion on the process-wide event loop."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
 
 class MagiSystem:
     """
@@ -58,6 +109,26 @@ class MagiSystem:
             self.api_key = LM_STUDIO_API_KEY
             print(f"🖥️  Using LM Studio: {self.llm_base_url}\n")
 
+        # Shared cache for semantically repeated queries (embeddings via LM Studio)
+        self.response_cache = None
+        if RESPONSE_CACHE_ENABLED:
+            http_client, http_async_client = get_http_clients(LM_STUDIO_URL)
+            self.response_cache = ProximityCache(
+                embeddings=OpenAIEmbeddings(
+                    model=RAG_EMBEDDING_MODEL,
+                    base_url=LM_STUDIO_URL,
+                    api_key=LM_STUDIO_API_KEY,
+                    check_embedding_ctx_length=False,
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                ),
+                threshold=RESPONSE_CACHE_THRESHOLD,
+                capacity=RESPONSE_CACHE_SIZE,
+            )
+
+        # Tool results shared between agents answering the same question
+        self.tool_cache = SharedToolCache()
+
         # Initialise Magi agents
         personalities = get_all_personalities()
         self.agents = [
@@ -74,6 +145,9 @@ class MagiSystem:
                 rag_collection=RAG_COLLECTION_NAME,
                 memory_db_path=MEMORY_DB_PATH,
                 enable_search=self.enable_search,
+                response_cache=self.response_cache,
+                history_length=MEMORY_HISTORY_LENGTH,
+                tool_cache=self.tool_cache,
             )
             for p in personalities
         ]
@@ -87,6 +161,10 @@ class MagiSystem:
             temperature=JUDGE_TEMPERATURE,
             session_id=self.session_id,
             memory_db_path=MEMORY_DB_PATH,
+            response_cache=self.response_cache,
+            unanimity_threshold=JUDGE_UNANIMITY_THRESHOLD,
+            max_tokens_per_response=JUDGE_MAX_TOKENS_PER_RESPONSE,
+            strict_validation=JUDGE_STRICT_VALIDATION,
         )
 
         print(f"MAGI System initialised with {len(self.agents)} agents")
@@ -101,39 +179,88 @@ class MagiSystem:
         """
         Submit a query to all MAGI agents and get deliberator's evaluation.
         """
-        print("\n" + "=" * 80)
-        print(f"MAGI QUERY: {question}")
-        print("=" * 80 + "\n")
+        return run_async(self.aquery_magi(question))
 
-        # Collect responses from all agents
-        responses = []
-        for agent in self.agents:
-            print(f"\n--- Querying {agent.name} ---")
-            # Enable debug=True to see DuckDuckGo search results
-            response = agent.respond(question, debug=False)
-            responses.append(response)
-
-            if response["success"]:
-                print(f"\n{agent.name} response:")
-                print(response["response"])
-            else:
-                print(f"\n{agent.name} encountered an error:")
-                print(response["response"])
+    async def aquery_magi(self, question: str) -> Dict:
+        """
+        Asynchronous version of query_magi().
+        All agents are queried concurrently, as each response is bound by LLM latency.
+        """
+        rule = "=" * 80
+        print(f"\n{rule}\nMAGI QUERY: {question}\n{rule}\n")
+
+        # Tool results from a previous question must not be reused, while questions
+        # answered concurrently keep their own
+        self.tool_cache.new_question()
+
+        # Collect responses from all agents concurrently
+        # Enable debug=True to see DuckDuckGo search results
+        if self._can_batch_agents():
+            responses = await MagiAgent.abatch_respond(self.agents, question)
+            for response in responses:
+                self._print_response(response)
+        else:
+            tasks = [
+                asyncio.create_task(self._arespond(agent, question))
+                for agent in self.agents
+            ]
+            # Report each agent as soon as it answers, while the others still run
+            for next_response in asyncio.as_completed(tasks):
+                self._print_response(await next_response)
+            responses = [task.result() for task in tasks]
 
         # Deliberator evaluates and synthesizes
-        result = self.deliberator.process_magi_decision(question, responses)
+        result = await self.deliberator.aprocess_magi_decision(question, responses)
 
+        now = datetime.now()
         return {
             "question": question,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
+            "timestamp_fs": now.strftime("%Y%m%dT%H%M%S%f"),
             "agent_responses": responses,
             "evaluation": result.evaluation,
             "final_answer": result.final_answer,
         }
 
+    @staticmethod
+    async def _arespond(agent: MagiAgent, question: str) -> Dict:
+        """
+        Query one agent, turning an unexpected failure into an error response so that
+        it does not discard the other agents' responses.
+        """
+        try:
+            return await agent.arespond(question, debug=False)
+        except Exception as e:
+            return {
+                "agent": agent.name,
+                "response": f"Error: {str(e)}",
+                "success": False,
+            }
+
+    @staticmethod
+    def _print_response(response: Dict):
+        """Print an agent's response, or the error it encountered, in one write."""
+        outcome = "response" if response["success"] else "encountered an error"
+        print(
+            f"--- Querying {response['agent']} ---\n"
+            f"\n{response['agent']} {outcome}:\n"
+            f"{response['response']}"
+        )
+
+    def _can_batch_agents(self) -> bool:
+        """
+        Whether all agents can be answered with one batched LLM call, which is the
+        case when none of them has tools and they all share the same LLM.
+        """
+        return all(not agent.tools for agent in self.agents) and (
+            len({id(agent.llm) for agent in self.agents}) == 1
+        )
+
     def clear_all_memory(self):
         """Clear memory for all agents and the deliberator."""
         for agent in self.agents:
             agent.clear_memory()
         self.deliberator.clear_memory()
+        if self.response_cache is not None:
+            self.response_cache.clear()
         print("All agent memories cleared.")
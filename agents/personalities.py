@@ -3,6 +3,8 @@ Personality definitions for the Magi council agents.
 Each agent has a unique perspective and decision-making approach.
 """
 
+import inspect
+
 PERSONALITIES = {
     "MELCHIOR": {
         "name": "MELCHIOR",
@@ -50,9 +52,17 @@ PERSONALITIES = {
 }
 
 
+# Remove the source indentation from the prompts once, so it is never sent to the LLM
+for _personality in PERSONALITIES.values():
+    _personality["system_prompt"] = inspect.cleandoc(_personality["system_prompt"])
+
+# Built once, as the personalities never change at runtime
+_ALL_PERSONALITIES = list(PERSONALITIES.values())
+
+
 def get_all_personalities():
     """Return list of all personality configurations."""
-    return list(PERSONALITIES.values())
+    return _ALL_PERSONALITIES
 
 
 def get_personality(name):
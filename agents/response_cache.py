@@ -0,0 +1,121 @@
+"""
+Approximate (semantic) response cache for the MAGI system.
+Returns a previously computed result when a new query is close enough to a cached one.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class ProximityCache:
+    """
+    Key-value cache matching queries by cosine distance between their embeddings.
+
+    Entries are grouped by namespace (e.g. one per agent) so that different agents
+    never receive each other's answers. Exact query matches are served without
+    embedding anything; other queries are embedded once and compared against
+    every cached query of the namespace.
+    """
+
+    def __init__(
+        self,
+        embeddings=None,
+        threshold: float = 0.05,
+        capacity: int = 128,
+    ):
+        """
+        Initialise the cache.
+
+        Args:
+            embeddings: LangChain embeddings object, or None for exact matching only
+            threshold: Maximum cosine distance for two queries to be considered equal
+            capacity: Maximum number of entries kept per namespace (LRU eviction)
+        """
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.capacity = capacity
+
+        self._entries: Dict[str, OrderedDict] = {}
+        self._vectors: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._embed_lock = threading.Lock()
+
+    def embed(self, query: str) -> Optional[List[float]]:
+        """
+        Return the normalised embedding of a query, computing it at most once.
+        Returns None when no embedding model is available.
+        """
+        if self.embeddings is None:
+            return None
+
+        # Concurrent agents ask for the same query; only the first one embeds it
+        with self._embed_lock:
+            if query in self._vectors:
+                self._vectors.move_to_end(query)
+                return self._vectors[query]
+
+            try:
+                vector = self.embeddings.embed_query(query)
+            except Exception as e:
+                print(f"Warning: Response cache falling back to exact matching: {e}")
+                self.embeddings = None
+                return None
+
+            norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+            vector = [x / norm for x in vector]
+
+            self._vectors[query] = vector
+            if len(self._vectors) > self.capacity:
+                self._vectors.popitem(last=False)
+            return vector
+
+    def lookup(self, namespace: str, query: str) -> Optional[Any]:
+        """
+        Return the cached value for the closest matching query, or None on a miss.
+        """
+        with self._lock:
+            entries = self._entries.get(namespace)
+            if not entries:
+                return None
+
+            # Exact match fast path
+            if query in entries:
+                entries.move_to_end(query)
+                return entries[query][1]
+
+        vector = self.embed(query)
+        if vector is None:
+            return None
+
+        with self._lock:
+            best_key, best_distance = None, None
+            for key, (key_vector, _) in entries.items():
+                if key_vector is None:
+                    continue
+                distance = 1.0 - sum(a * b for a, b in zip(vector, key_vector))
+                if best_distance is None or distance < best_distance:
+                    best_key, best_distance = key, distance
+
+            if best_key is None or best_distance > self.threshold:
+                return None
+
+            entries.move_to_end(best_key)
+            return entries[best_key][1]
+
+    def store(self, namespace: str, query: str, value: Any):
+        """Cache a value for a query, evicting the least recently used entry."""
+        vector = self.embed(query)
+
+        with self._lock:
+            entries = self._entries.setdefault(namespace, OrderedDict())
+            entries[query] = (vector, value)
+            entries.move_to_end(query)
+            if len(entries) > self.capacity:
+                entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all cached entries."""
+        with self._lock:
+            self._entries.clear()
@@ -3,6 +3,8 @@ Configuration file for the MAGI System.
 Customise these settings to match your LLM provider setup.
 """
 
+import os
+
 # LLM Provider Selection
 # Options: "lm_studio" or "gemini"
 LLM_PROVIDER = "lm_studio"  # Change to "gemini" to use Google Gemini
@@ -13,6 +15,7 @@ LM_STUDIO_MODEL = (
     "openai/gpt-oss-20b"  # Change this to your loaded model name in LM Studio
 )
 LM_STUDIO_API_KEY = "lm-studio-local"  # Set to None for local LM Studio without API key
+LM_STUDIO_MAX_CONNECTIONS = 32  # HTTP connections shared by all agents and the judge
 
 # Google Gemini Configuration
 GEMINI_MODEL = (
@@ -27,10 +30,14 @@ AGENT_VERBOSE = True  # Show agent thinking process
 # Judge Configuration
 JUDGE_TEMPERATURE = 0.1  # Lower temperature for more consistent evaluation
 JUDGE_MAX_TOKENS = None
+JUDGE_UNANIMITY_THRESHOLD = 0.9  # Skip deliberation when all responses are this similar
+JUDGE_MAX_TOKENS_PER_RESPONSE = 800  # Agent responses are truncated to this (None = no limit)
+JUDGE_STRICT_VALIDATION = False  # Validate deliberation output with Pydantic (for debugging)
 
 # Memory Configuration
 MEMORY_DB_PATH = "sqlite:///magi_history.db"
 CLEAR_MEMORY_ON_START = True  # Set to True to start fresh each time
+MEMORY_HISTORY_LENGTH = 32  # Recent messages passed to each agent as context
 
 # Search Configuration
 SEARCH_ENABLED = True
@@ -43,13 +50,37 @@ RAG_PERSIST_DIR = "./chroma_db"  # Directory for ChromaDB persistence
 RAG_EMBEDDING_MODEL = (
     "text-embedding-qwen3-embedding-4b"  # Embedding model name in LM Studio
 )
+RAG_LOCAL_EMBEDDINGS = False  # Embed in-process with sentence-transformers instead
+RAG_LOCAL_EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"  # Re-ingest after switching models
+RAG_LOCAL_EMBEDDING_DEVICE = "cpu"  # Device running the local embedding model
+RAG_LOCAL_EMBEDDING_PRECISION = os.getenv(  # fp32, fp16 (GPU only) or int8 (ONNX)
+    "MAGI_EMBEDDING_PRECISION", "int8"
+)
+RAG_LOCAL_EMBEDDING_CACHE_DIR = "./local_models"  # Models quantized to int8 locally
 RAG_CHUNK_SIZE = 1000  # Size of text chunks for document splitting
 RAG_CHUNK_OVERLAP = 200  # Overlap between chunks
 RAG_SEARCH_K = 3  # Number of documents to retrieve per query
+RAG_HNSW_METADATA = {  # Vector index settings, applied when a collection is created
+    "hnsw:construction_ef": 100,  # Build-time search width (lower = faster ingestion)
+    "hnsw:M": 16,  # Links per vector in the index graph
+}
+RAG_FAST_INGEST_CONSTRUCTION_EF = 64  # Build-time search width with fast_ingest=True
+RAG_EMBEDDING_CACHE_PATH = "embedding_cache.db"  # SQLite cache of computed embeddings
+RAG_INGEST_BATCH_SIZE = 200  # Chunks embedded and stored per vector store request
+RAG_INGEST_CONCURRENCY = 8  # Batches embedded at the same time during ingestion
+RAG_INGEST_WORKERS = int(  # Processes loading documents in parallel during ingestion
+    os.getenv("MAGI_INGEST_WORKERS", max(1, (os.cpu_count() or 2) - 1))
+)
+
+# Response Cache Configuration
+RESPONSE_CACHE_ENABLED = True  # Reuse answers for semantically repeated queries
+RESPONSE_CACHE_THRESHOLD = 0.05  # Max cosine distance between queries for a cache hit
+RESPONSE_CACHE_SIZE = 128  # Max cached queries per agent (least recently used evicted)
 
 # Session Configuration
 AUTO_SAVE_RESULTS = True  # Save results to JSON files automatically
 RESULTS_DIR = "results"  # Directory to save results (created if doesn't exist)
+DEBUG = os.getenv("MAGI_DEBUG") == "1"  # Print full tracebacks of deliberation errors
 
 # Example queries for testing
 EXAMPLE_QUERIES = [
@@ -2,11 +2,14 @@
 Example usage module for the MAGI System.
 """
 
-import json
+import asyncio
+import os
 from pathlib import Path
 from typing import Any, Dict
 
-from agents.magi_system import MagiSystem
+import orjson
+
+from agents.magi_system import MagiSystem, run_async
 from config import RESULTS_DIR
 
 
@@ -18,14 +21,28 @@ def prepare_result_for_json(result: Dict[str, Any]) -> Dict[str, Any]:
         "question": result["question"],
         "timestamp": result["timestamp"],
         "agent_responses": result["agent_responses"],
-        "evaluation": result["evaluation"].model_dump(),
+        "evaluation": result["evaluation"].model_dump(mode="json"),
         "final_answer": result["final_answer"],
     }
 
 
-def run_example_queries():
+def save_result(result: Dict[str, Any], path: str):
+    """
+    Write a result to a JSON file.
+    """
+    Path(RESULTS_DIR).mkdir(exist_ok=True)
+    Path(path).write_bytes(
+        orjson.dumps(prepare_result_for_json(result), option=orjson.OPT_INDENT_2)
+    )
+
+
+async def arun_example_queries():
     """
     Run example queries to demonstrate the MAGI System.
+    The queries are independent, so they run concurrently; MAGI_CONCURRENCY bounds
+    how many are in flight at once to stay within API rate limits (3 by default).
+    Each query keeps its own tool results, but the agents' histories and the printed
+    output interleave; set MAGI_CONCURRENCY=1 to keep them in order.
     """
     # Initialise MAGI System
     magi_system = MagiSystem()
@@ -37,24 +54,33 @@ def run_example_queries():
         "How should society balance economic growth with environmental protection?",
     ]
 
-    results = []
+    semaphore = asyncio.Semaphore(int(os.getenv("MAGI_CONCURRENCY", "3")))
 
-    for query in example_queries:
-        print(f"\n\n{'#' * 80}")
-        print("# EXAMPLE QUERY")
-        print(f"{'#' * 80}\n")
+    async def run_query(query: str) -> Dict[str, Any]:
+        async with semaphore:
+            print(f"\n\n{'#' * 80}")
+            print("# EXAMPLE QUERY")
+            print(f"{'#' * 80}\n")
 
-        result = magi_system.query_magi(query)
-        results.append(result)
+            result = await magi_system.aquery_magi(query)
 
-        # Save results to file
-        Path(RESULTS_DIR).mkdir(exist_ok=True)
-        with open(
-            f"{RESULTS_DIR}/results_{result['timestamp'].replace(':', '-')}.json", "w"
-        ) as f:
-            json.dump(prepare_result_for_json(result), f, indent=2)
+        # Save results to file without blocking the other queries
+        await asyncio.to_thread(
+            save_result,
+            result,
+            f"{RESULTS_DIR}/results_{result['timestamp_fs']}.json",
+        )
 
-    return results
+        return result
+
+    return await asyncio.gather(*(run_query(q) for q in example_queries))
+
+
+def run_example_queries():
+    """
+    Run example queries to demonstrate the MAGI System.
+    """
+    return run_async(arun_example_queries())
 
 
 def run_single_query(question: str):
@@ -65,9 +91,7 @@ def run_single_query(question: str):
     result = council.query_magi(question)
 
     # Save result to file
-    Path(RESULTS_DIR).mkdir(exist_ok=True)
-    with open(f"{RESULTS_DIR}/example_result.json", "w") as f:
-        json.dump(prepare_result_for_json(result), f, indent=2)
+    save_result(result, f"{RESULTS_DIR}/example_result.json")
 
     return result
 
@@ -3,9 +3,21 @@ Document ingestion utility for the MAGI system.
 Loads documents and adds them to the ChromaDB vector store.
 """
 
+import hashlib
+import json
 import os
+import queue
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import lru_cache
+from itertools import chain, repeat
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
 from langchain_chroma import Chroma
 from langchain_community.document_loaders import (
@@ -14,18 +26,372 @@ from langchain_community.document_loaders import (
     UnstructuredMarkdownLoader,
 )
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from tqdm import tqdm
 
+from agents.llm import get_http_clients
 from config import (
     LM_STUDIO_API_KEY,
     LM_STUDIO_URL,
     RAG_CHUNK_OVERLAP,
     RAG_CHUNK_SIZE,
     RAG_COLLECTION_NAME,
+    RAG_EMBEDDING_CACHE_PATH,
     RAG_EMBEDDING_MODEL,
+    RAG_FAST_INGEST_CONSTRUCTION_EF,
+    RAG_HNSW_METADATA,
+    RAG_INGEST_BATCH_SIZE,
+    RAG_INGEST_CONCURRENCY,
+    RAG_INGEST_WORKERS,
+    RAG_LOCAL_EMBEDDING_DEVICE,
+    RAG_LOCAL_EMBEDDING_MODEL,
+    RAG_LOCAL_EMBEDDING_PRECISION,
+    RAG_LOCAL_EMBEDDINGS,
     RAG_PERSIST_DIR,
 )
+from tools.embedding_cache import CachedEmbeddings
+from tools.local_embeddings import LocalEmbeddings
+
+
+def _with_cache(embeddings: Embeddings, embedding_model: str) -> Embeddings:
+    """
+    Wrap embeddings in the persistent cache shared with the RAG tool, so that
+    re-ingested text is never embedded twice.
+    """
+    try:
+        return CachedEmbeddings(
+            embeddings, model_name=embedding_model, db_path=RAG_EMBEDDING_CACHE_PATH
+        )
+    except Exception as e:
+        print(f"Warning: Could not open embedding cache: {e}")
+        return embeddings
+
+
+# Document loader for each supported file extension
+_LOADERS = {
+    ".pdf": PyPDFLoader,
+    ".md": UnstructuredMarkdownLoader,
+    ".txt": TextLoader,
+    ".text": TextLoader,
+}
+
+
+@lru_cache(maxsize=4)
+def _get_embeddings(
+    embedding_model: str, embedding_base_url: str, embedding_api_key: str
+) -> Embeddings:
+    """
+    Return the cached embeddings for a model, created and tested once per process.
+    The local model takes precedence when RAG_LOCAL_EMBEDDINGS is set, so that the
+    RAG tool searches with the same embeddings.
+    Raises the error of the test request if the embedding server doesn't respond.
+    """
+    if RAG_LOCAL_EMBEDDINGS:
+        embeddings = LocalEmbeddings(
+            RAG_LOCAL_EMBEDDING_MODEL,
+            device=RAG_LOCAL_EMBEDDING_DEVICE,
+            precision=RAG_LOCAL_EMBEDDING_PRECISION,
+        )
+        embedding_model = embeddings.model_id
+    else:
+        http_client, http_async_client = get_http_clients(embedding_base_url)
+        embeddings = OpenAIEmbeddings(
+            model=embedding_model,
+            base_url=embedding_base_url,
+            api_key=embedding_api_key,
+            check_embedding_ctx_length=False,  # Disable length validation
+            http_client=http_client,  # Keep-alive connections shared by all batches
+            http_async_client=http_async_client,
+        )
+
+    # Test embeddings before proceeding
+    print(f"Testing embeddings with model: {embedding_model}")
+    test_result = embeddings.embed_query("test")
+    print(f"✓ Embeddings working! Dimension: {len(test_result)}")
+
+    # Reuse embeddings computed by previous runs
+    return _with_cache(embeddings, embedding_model)
+
+
+@lru_cache(maxsize=8)
+def _get_splitter(
+    chunk_size: int, chunk_overlap: int
+) -> RecursiveCharacterTextSplitter:
+    """Return the text splitter for the given chunking, built once per process."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+
+
+def _load_one(file_path: str, chunk_size: int, chunk_overlap: int) -> List[Document]:
+    """
+    Load a single file and split it into chunks.
+    Defined at module level so that it can run in a worker process.
+    """
+    if not os.path.exists(file_path):
+        print(f"Warning: File not found - {file_path}")
+        return []
+
+    file_extension = Path(file_path).suffix.lower()
+
+    try:
+        # Choose loader based on file type
+        loader_cls = _LOADERS.get(file_extension)
+        if loader_cls is None:
+            print(f"Warning: Unsupported file type - {file_path}")
+            return []
+        loader = loader_cls(file_path)
+
+        # Load documents
+        documents = loader.load()
+
+        # Add source metadata
+        for doc in documents:
+            doc.metadata["source"] = file_path
+
+        # Split documents into chunks
+        chunks = _get_splitter(chunk_size, chunk_overlap).split_documents(documents)
+
+        print(f"✓ Loaded {len(chunks)} chunks from {file_path}")
+        return chunks
+
+    except Exception as e:
+        print(f"Error loading {file_path}: {str(e)}")
+        return []
+
+
+def _load_all(
+    file_paths: List[str], chunk_size: int, chunk_overlap: int, num_workers: int
+) -> Iterator[List[Document]]:
+    """
+    Load and split files in a process pool (PDF parsing is CPU-bound), yielding
+    the chunks of each file in the order of file_paths.
+    """
+    if num_workers <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            yield _load_one(file_path, chunk_size, chunk_overlap)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(num_workers, len(file_paths))) as ex:
+        try:
+            yield from ex.map(
+                _load_one,
+                file_paths,
+                repeat(chunk_size),
+                repeat(chunk_overlap),
+            )
+        finally:
+            # Don't load the remaining files when the consumer stops early
+            ex.shutdown(cancel_futures=True)
+
+
+def _document_id(doc: Document) -> str:
+    """
+    Derive a document's vector store ID from its content and metadata, so that
+    ingesting the same document again replaces it instead of duplicating it.
+    """
+    metadata = json.dumps(doc.metadata, sort_keys=True, default=str)
+    return hashlib.sha1(f"{metadata}\0{doc.page_content}".encode()).hexdigest()
+
+
+def _add_batch(
+    vectorstore: Chroma,
+    batch: List[Document],
+    number: int,
+    verbose: bool,
+    progress: tqdm,
+) -> int:
+    """
+    Upsert one batch of documents into the vector store, embedded in one request.
+    Documents already in the store are skipped, so an interrupted ingestion can
+    simply be run again. Documents of a failing batch are retried one by one, so
+    that a single bad document doesn't discard the rest.
+
+    Progress is reported on the given progress bar, and errors are written above it.
+
+    Returns:
+        Number of documents added
+    """
+    # Exact duplicates (same content and metadata) share an ID, so store them once
+    documents = {_document_id(doc): doc for doc in batch}
+
+    # Skip documents stored by a previous (possibly interrupted) run
+    try:
+        stored = vectorstore.get(ids=list(documents), include=[])["ids"]
+    except Exception:
+        stored = []
+    for doc_id in stored:
+        documents.pop(doc_id, None)
+    progress.update(len(batch) - len(documents))
+    if not documents:
+        return 0
+
+    try:
+        vectorstore.add_documents(list(documents.values()), ids=list(documents))
+        progress.update(len(documents))
+        return len(documents)
+    except Exception as batch_error:
+        tqdm.write(f"  Error in batch {number}: {str(batch_error)}")
+
+    # Try adding documents one by one in this batch
+    added = 0
+    for doc_id, doc in documents.items():
+        try:
+            vectorstore.add_documents([doc], ids=[doc_id])
+            added += 1
+        except Exception as doc_error:
+            if verbose:
+                tqdm.write(f"    Skipped document: {str(doc_error)[:100]}")
+        progress.update(1)
+    return added
+
+
+_METADATA_TYPES = (str, int, float, bool)
+
+
+def _clean_documents(documents: List[Document]) -> List[Document]:
+    """
+    Drop empty chunks, strip the others and make their metadata values
+    serialisable (strings, numbers, booleans). Documents are cleaned in place.
+    """
+    cleaned = []
+    for doc in documents:
+        # Ensure page_content is a string and not empty
+        content = doc.page_content
+        if not (isinstance(content, str) and content.strip()):
+            continue
+        doc.page_content = content.strip()
+
+        metadata = doc.metadata
+        if not all(isinstance(v, _METADATA_TYPES) for v in metadata.values()):
+            for key, value in metadata.items():
+                if not isinstance(value, _METADATA_TYPES):
+                    metadata[key] = str(value)
+        cleaned.append(doc)
+    return cleaned
+
+
+def _stream_documents(
+    file_paths: List[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    num_workers: int,
+    max_pending: int = 4,
+) -> Iterator[Document]:
+    """
+    Load, split and clean files on a background thread, yielding chunks as soon as
+    each file is ready so that embedding overlaps with loading. At most
+    max_pending loaded files wait to be consumed, which bounds memory use.
+    Closing the generator early stops loading, once the files being loaded are done.
+    """
+    loaded: queue.Queue = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+
+    def load():
+        results = _load_all(file_paths, chunk_size, chunk_overlap, num_workers)
+        try:
+            for chunks in results:
+                loaded.put(_clean_documents(chunks))
+                if stop.is_set():
+                    break
+        except Exception as e:
+            print(f"Error loading documents: {str(e)}")
+        finally:
+            results.close()
+            loaded.put(None)
+
+    threading.Thread(target=load, name="magi-ingest-loader", daemon=True).start()
+    chunks: Optional[List[Document]] = []
+    try:
+        while (chunks := loaded.get()) is not None:
+            yield from chunks
+    finally:
+        stop.set()
+        # Unblock the loader until it has ended
+        while chunks is not None:
+            chunks = loaded.get()
+
+
+def _batch_documents(
+    documents: Iterable[Document], batch_size: int, window_batches: int = 1
+) -> Iterator[List[Document]]:
+    """
+    Split documents into batches of about batch_size, keeping documents with
+    identical content (e.g. repeated headers or licence blocks) in the same batch.
+    Documents are grouped within windows of window_batches batches, so only one
+    window is held in memory at a time.
+    """
+    window_size = batch_size * window_batches
+
+    def split(groups: Dict[bytes, List[Document]]) -> Iterator[List[Document]]:
+        batch: List[Document] = []
+        for group in groups.values():
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+            batch.extend(group)
+        if batch:
+            yield batch
+
+    groups: Dict[bytes, List[Document]] = {}
+    count = 0
+    for doc in documents:
+        key = hashlib.sha1(doc.page_content.encode()).digest()
+        groups.setdefault(key, []).append(doc)
+        count += 1
+        if count >= window_size:
+            yield from split(groups)
+            groups, count = {}, 0
+    yield from split(groups)
+
+
+def _add_in_batches(
+    vectorstore: Chroma,
+    documents: Iterable[Document],
+    batch_size: int = RAG_INGEST_BATCH_SIZE,
+    max_workers: int = RAG_INGEST_CONCURRENCY,
+    verbose: bool = True,
+) -> int:
+    """
+    Add documents to the vector store in batches, with up to max_workers batches
+    being embedded at the same time, showing a progress bar when verbose.
+    Documents are consumed as batches are submitted, so they can be streamed in
+    while loading is still in progress.
+    Identical chunks within a window of concurrent batches share a batch, so that
+    the embedding cache embeds their text only once.
+
+    Returns:
+        Number of documents added
+    """
+    batches = _batch_documents(documents, batch_size, window_batches=max_workers)
+    progress = tqdm(desc="Ingesting", unit="chunks", disable=not verbose)
+
+    with progress:
+        if max_workers <= 1:
+            return sum(
+                _add_batch(vectorstore, batch, number, verbose, progress)
+                for number, batch in enumerate(batches, 1)
+            )
+
+        total_added = 0
+        pending = set()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for number, batch in enumerate(batches, 1):
+                # Don't load further ahead than the batches being embedded
+                if len(pending) >= max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    total_added += sum(f.result() for f in done)
+                pending.add(
+                    executor.submit(
+                        _add_batch, vectorstore, batch, number, verbose, progress
+                    )
+                )
+            total_added += sum(f.result() for f in pending)
+        return total_added
 
 
 def ingest_documents(
@@ -37,6 +403,8 @@ def ingest_documents(
     embedding_api_key: str = LM_STUDIO_API_KEY,
     chunk_size: int = RAG_CHUNK_SIZE,
     chunk_overlap: int = RAG_CHUNK_OVERLAP,
+    num_workers: int = RAG_INGEST_WORKERS,
+    fast_ingest: bool = False,
 ) -> int:
     """
     Ingest documents into the ChromaDB vector store.
@@ -50,130 +418,57 @@ def ingest_documents(
         embedding_api_key: API key for embeddings (defaults to LM Studio)
         chunk_size: Size of text chunks for splitting
         chunk_overlap: Overlap between chunks
+        num_workers: Number of processes loading and splitting files
+        fast_ingest: Build a new collection's index with a narrower search, trading
+            some recall for faster ingestion of large corpora
 
     Returns:
         Number of document chunks added to the vector store
     """
-    # Initialise embeddings with LM Studio
-    embeddings = OpenAIEmbeddings(
-        model=embedding_model,
-        base_url=embedding_base_url,
-        api_key=embedding_api_key,
-        check_embedding_ctx_length=False,  # Disable length validation
-    )
-
-    # Test embeddings before proceeding
-    print(f"Testing embeddings with model: {embedding_model}")
+    # Initialise embeddings with LM Studio, tested on first use
     try:
-        test_result = embeddings.embed_query("test")
-        print(f"✓ Embeddings working! Dimension: {len(test_result)}")
+        embeddings = _get_embeddings(
+            embedding_model, embedding_base_url, embedding_api_key
+        )
     except Exception as e:
         print(f"✗ Embedding test failed: {e}")
         print("Please ensure LM Studio is running with an embedding model loaded.")
         return 0
 
-    # Initialise text splitter
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-    )
-
-    # Load and process documents
-    all_documents = []
-
-    for file_path in file_paths:
-        if not os.path.exists(file_path):
-            print(f"Warning: File not found - {file_path}")
-            continue
-
-        file_extension = Path(file_path).suffix.lower()
+    # Index settings only apply to new collections
+    collection_metadata = RAG_HNSW_METADATA
+    if fast_ingest:
+        collection_metadata = {
+            **collection_metadata,
+            "hnsw:construction_ef": RAG_FAST_INGEST_CONSTRUCTION_EF,
+        }
 
-        try:
-            # Choose loader based on file type
-            if file_extension == ".pdf":
-                loader = PyPDFLoader(file_path)
-            elif file_extension == ".md":
-                loader = UnstructuredMarkdownLoader(file_path)
-            elif file_extension in [".txt", ".text"]:
-                loader = TextLoader(file_path)
-            else:
-                print(f"Warning: Unsupported file type - {file_path}")
-                continue
-
-            # Load documents
-            documents = loader.load()
-
-            # Add source metadata
-            for doc in documents:
-                doc.metadata["source"] = file_path
-
-            # Split documents into chunks
-            chunks = text_splitter.split_documents(documents)
-            all_documents.extend(chunks)
-
-            print(f"✓ Loaded {len(chunks)} chunks from {file_path}")
-
-        except Exception as e:
-            print(f"Error loading {file_path}: {str(e)}")
-            continue
-
-    if not all_documents:
-        print("No documents were successfully loaded.")
-        return 0
-
-    # Clean and validate documents
-    cleaned_documents = []
-    for doc in all_documents:
-        # Ensure page_content is a string and not empty
-        if isinstance(doc.page_content, str) and doc.page_content.strip():
-            # Ensure metadata values are serializable (strings, numbers, booleans)
-            clean_metadata = {}
-            for key, value in doc.metadata.items():
-                if isinstance(value, (str, int, float, bool)):
-                    clean_metadata[key] = value
-                else:
-                    clean_metadata[key] = str(value)
-
-            cleaned_doc = Document(
-                page_content=doc.page_content.strip(), metadata=clean_metadata
-            )
-            cleaned_documents.append(cleaned_doc)
-
-    if not cleaned_documents:
-        print("No valid documents after cleaning.")
-        return 0
-
-    print(f"Cleaned {len(cleaned_documents)} documents for ingestion...")
+    documents = None
+    try:
+        # Initialise ChromaDB vector store before loading starts, so that a failure
+        # leaves no loader running
+        vectorstore = Chroma(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=persist_directory,
+            collection_metadata=collection_metadata,
+        )
 
-    # Initialise ChromaDB vector store
-    vectorstore = Chroma(
-        collection_name=collection_name,
-        embedding_function=embeddings,
-        persist_directory=persist_directory,
-    )
+        # Load, split and clean documents in the background, parsing several files
+        # at once, while earlier chunks are being embedded
+        documents = _stream_documents(
+            file_paths, chunk_size, chunk_overlap, num_workers
+        )
+        first_document = next(documents, None)
 
-    # Add documents to vector store
-    try:
-        # Add documents in batches to avoid API issues
-        batch_size = 50
-        total_added = 0
+        if first_document is None:
+            print("No valid documents were loaded.")
+            return 0
 
-        for i in range(0, len(cleaned_documents), batch_size):
-            batch = cleaned_documents[i : i + batch_size]
-            try:
-                vectorstore.add_documents(batch)
-                total_added += len(batch)
-                print(f"  Added batch {i // batch_size + 1}: {len(batch)} documents")
-            except Exception as batch_error:
-                print(f"  Error in batch {i // batch_size + 1}: {str(batch_error)}")
-                # Try adding documents one by one in this batch
-                for doc in batch:
-                    try:
-                        vectorstore.add_documents([doc])
-                        total_added += 1
-                    except Exception as doc_error:
-                        print(f"    Skipped document: {str(doc_error)[:100]}")
+        # Add documents to vector store
+        total_added = _add_in_batches(
+            vectorstore, chain([first_document], documents), verbose=True
+        )
 
         print(
             f"\n✓ Successfully added {total_added} document chunks to the vector store."
@@ -185,6 +480,37 @@ def ingest_documents(
     except Exception as e:
         print(f"Error adding documents to vector store: {str(e)}")
         return 0
+    finally:
+        if documents is not None:
+            # Stop the loader and its worker processes if ingestion ended early
+            documents.close()
+
+
+def _find_files(
+    directory_path: str, file_extensions: List[str], recursive: bool
+) -> List[str]:
+    """
+    List the files with one of the given extensions in a single walk of the
+    directory, instead of one walk per extension.
+    """
+    if not os.path.isdir(directory_path):
+        return []
+
+    extensions = {ext.lower() for ext in file_extensions}
+    if recursive:
+        return [
+            os.path.join(root, name)
+            for root, _, names in os.walk(directory_path)
+            for name in names
+            if os.path.splitext(name)[1].lower() in extensions
+        ]
+
+    with os.scandir(directory_path) as entries:
+        return [
+            entry.path
+            for entry in entries
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions
+        ]
 
 
 def ingest_from_directory(
@@ -194,6 +520,7 @@ def ingest_from_directory(
     embedding_model: str = RAG_EMBEDDING_MODEL,
     recursive: bool = True,
     file_extensions: Optional[List[str]] = None,
+    num_workers: int = RAG_INGEST_WORKERS,
 ) -> int:
     """
     Ingest all supported documents from a directory.
@@ -205,6 +532,7 @@ def ingest_from_directory(
         embedding_model: Name of the embedding model to use
         recursive: Whether to search subdirectories
         file_extensions: List of file extensions to include (e.g., ['.pdf', '.txt'])
+        num_workers: Number of processes loading and splitting files
 
     Returns:
         Number of document chunks added to the vector store
@@ -213,15 +541,7 @@ def ingest_from_directory(
         file_extensions = [".pdf", ".txt", ".md"]
 
     # Find all files with supported extensions
-    directory = Path(directory_path)
-    file_paths = []
-
-    if recursive:
-        for ext in file_extensions:
-            file_paths.extend([str(f) for f in directory.rglob(f"*{ext}")])
-    else:
-        for ext in file_extensions:
-            file_paths.extend([str(f) for f in directory.glob(f"*{ext}")])
+    file_paths = _find_files(directory_path, file_extensions, recursive)
 
     if not file_paths:
         print(f"No files found in {directory_path} with extensions {file_extensions}")
@@ -237,6 +557,7 @@ def ingest_from_directory(
         collection_name=collection_name,
         persist_directory=persist_directory,
         embedding_model=embedding_model,
+        num_workers=num_workers,
     )
 
 
@@ -265,19 +586,15 @@ def ingest_text_directly(
         Number of document chunks added to the vector store
     """
     # Initialise embeddings
-    embeddings = OpenAIEmbeddings(
-        model=embedding_model,
-        base_url=LM_STUDIO_URL,
-        api_key=LM_STUDIO_API_KEY,
-        check_embedding_ctx_length=False,  # Disable length validation
-    )
+    try:
+        embeddings = _get_embeddings(embedding_model, LM_STUDIO_URL, LM_STUDIO_API_KEY)
+    except Exception as e:
+        print(f"✗ Embedding test failed: {e}")
+        print("Please ensure LM Studio is running with an embedding model loaded.")
+        return 0
 
     # Initialise text splitter
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-    )
+    text_splitter = _get_splitter(chunk_size, chunk_overlap)
 
     # Create documents
     documents = []
@@ -291,20 +608,7 @@ def ingest_text_directly(
     chunks = text_splitter.split_documents(documents)
 
     # Clean and validate documents
-    cleaned_chunks = []
-    for doc in chunks:
-        if isinstance(doc.page_content, str) and doc.page_content.strip():
-            clean_metadata = {}
-            for key, value in doc.metadata.items():
-                if isinstance(value, (str, int, float, bool)):
-                    clean_metadata[key] = value
-                else:
-                    clean_metadata[key] = str(value)
-
-            cleaned_doc = Document(
-                page_content=doc.page_content.strip(), metadata=clean_metadata
-            )
-            cleaned_chunks.append(cleaned_doc)
+    cleaned_chunks = _clean_documents(chunks)
 
     if not cleaned_chunks:
         print("No valid documents after cleaning.")
@@ -315,28 +619,12 @@ def ingest_text_directly(
         collection_name=collection_name,
         embedding_function=embeddings,
         persist_directory=persist_directory,
+        collection_metadata=RAG_HNSW_METADATA,
     )
 
     # Add documents
     try:
-        # Add documents in batches
-        batch_size = 50
-        total_added = 0
-
-        for i in range(0, len(cleaned_chunks), batch_size):
-            batch = cleaned_chunks[i : i + batch_size]
-            try:
-                vectorstore.add_documents(batch)
-                total_added += len(batch)
-            except Exception as batch_error:
-                print(f"Error in batch {i // batch_size + 1}: {str(batch_error)}")
-                # Try one by one
-                for doc in batch:
-                    try:
-                        vectorstore.add_documents([doc])
-                        total_added += 1
-                    except Exception:
-                        pass
+        total_added = _add_in_batches(vectorstore, cleaned_chunks, verbose=False)
 
         print(
             f"✓ Successfully added {total_added} document chunks to the vector store."
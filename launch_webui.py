@@ -4,29 +4,37 @@ Quick launcher for MAGI System Web UI.
 Checks dependencies and launches Streamlit.
 """
 
+import http.client
+import importlib.metadata
+import importlib.util
+import os
 import sys
 import subprocess
 
 
 def check_streamlit():
-    """Check if Streamlit is installed."""
-    try:
-        import streamlit
-
-        return True, streamlit.__version__
-    except ImportError:
+    """
+    Check if Streamlit is installed, without importing it (which is slow, and
+    unnecessary as Streamlit runs in its own process).
+    """
+    if importlib.util.find_spec("streamlit") is None:
         return False, None
+    try:
+        return True, importlib.metadata.version("streamlit")
+    except importlib.metadata.PackageNotFoundError:
+        return True, "unknown"
 
 
 def check_lm_studio():
-    """Check if LM Studio server is reachable."""
+    """Check if LM Studio server is reachable (with the standard library only)."""
+    connection = http.client.HTTPConnection("localhost", 1234, timeout=2)
     try:
-        import requests
-
-        response = requests.get("http://localhost:1234/v1/models", timeout=2)
-        return response.status_code == 200
+        connection.request("GET", "/v1/models")
+        return connection.getresponse().status == 200
     except Exception:
         return False
+    finally:
+        connection.close()
 
 
 def main():
@@ -74,22 +82,26 @@ def main():
     print("Press Ctrl+C to stop the server.")
     print()
 
-    # Launch Streamlit
-    try:
-        subprocess.run(
-            [
-                sys.executable,
-                "-m",
-                "streamlit",
-                "run",
-                "streamlit_app.py",
-                "--server.headless",
-                "false",
-            ]
-        )
-    except KeyboardInterrupt:
-        print("\n\nShutting down Web UI...")
-        print("Goodbye! 👋")
+    # Launch Streamlit, replacing this process so that it receives Ctrl+C directly
+    command = [
+        sys.executable,
+        "-m",
+        "streamlit",
+        "run",
+        "streamlit_app.py",
+        "--server.headless",
+        "false",
+    ]
+    if os.name == "nt":
+        # Windows has no real exec, so keep the launcher as the parent process
+        try:
+            subprocess.run(command)
+        except KeyboardInterrupt:
+            print("\n\nShutting down Web UI...")
+            print("Goodbye! 👋")
+    else:
+        sys.stdout.flush()
+        os.execv(sys.executable, command)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,19 @@
-import json
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 from agents.magi_system import MagiSystem
 from config import RESULTS_DIR
+from example import save_result
+
+# Results are saved in the background, so the next prompt appears immediately
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="magi-results")
+
+
+def _persist_result(result):
+    """Save a query result to a JSON file, reporting rather than raising errors."""
+    try:
+        save_result(result, f"{RESULTS_DIR}/results_{result['timestamp_fs']}.json")
+    except Exception as e:
+        print(f"\nError saving result: {e}")
 
 
 def main():
@@ -42,19 +53,7 @@ def main():
             result = magi_system.query_magi(query)
 
             # Save result to file
-            Path(RESULTS_DIR).mkdir(exist_ok=True)
-            result_dict = {
-                "question": result["question"],
-                "timestamp": result["timestamp"],
-                "agent_responses": result["agent_responses"],
-                "evaluation": result["evaluation"].model_dump(),
-                "final_answer": result["final_answer"],
-            }
-            with open(
-                f"{RESULTS_DIR}/results_{result['timestamp'].replace(':', '-')}.json",
-                "w",
-            ) as f:
-                json.dump(result_dict, f, indent=2)
+            _writer.submit(_persist_result, result)
 
         except KeyboardInterrupt:
             print("\n\nInterrupted. Shutting down...")
@@ -65,4 +64,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        _writer.shutdown(wait=True)
@@ -3,9 +3,15 @@ Streamlit Web Interface for MAGI System
 A multi-agent AI council with streaming responses
 """
 
+import functools
+import queue
+import re
 import streamlit as st
 from datetime import datetime
 import time
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from markdown_it import MarkdownIt
+from mdit_py_plugins.dollarmath import dollarmath_plugin
 
 from agents.magi_system import MagiSystem
 from config import LLM_PROVIDER, LM_STUDIO_MODEL, GEMINI_MODEL
@@ -20,9 +26,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown(
-    """
-<style>
+_CSS = """
     .stTextInput > div > div > input {
         font-size: 16px;
     }
@@ -52,10 +56,13 @@ st.markdown(
         margin: 20px 0;
         border-left: 5px solid #28a745;
     }
-</style>
-""",
-    unsafe_allow_html=True,
+"""
+
+# Minified once, as the styles have to be sent again on every rerun
+CUSTOM_CSS = "<style>{}</style>".format(
+    re.sub(r":\s+", ":", re.sub(r"\s*([{};,>])\s*", r"\1", " ".join(_CSS.split())))
 )
+st.html(CUSTOM_CSS)
 
 
 def init_session_state():
@@ -87,39 +94,246 @@ def initialize_magi_system():
             return False
 
 
-def stream_text(text, container, delay=0.01):
-    """Stream text character by character to a container"""
-    displayed_text = ""
-    for char in text:
-        displayed_text += char
-        container.markdown(displayed_text)
-        time.sleep(delay)
-    return displayed_text
+# Server-side markdown renderer for complete text, following GitHub-flavoured
+# markdown (raw HTML in the text is escaped). LaTeX math is only recognised, so that
+# text containing it can be left to the browser, which typesets it.
+_markdown = MarkdownIt("gfm-like", {"html": False}).use(dollarmath_plugin)
+_PRE_BLOCK = re.compile(r"<pre\b.*?</pre>", re.DOTALL)
 
 
-def display_agent_response(agent_name, response_text, stream=True):
-    """Display an agent's response with optional streaming"""
-    st.markdown(
-        f'<div class="agent-name">🤖 {agent_name}</div>', unsafe_allow_html=True
-    )
+@functools.lru_cache(maxsize=256)
+def render_md(text):
+    """
+    Render markdown text to HTML, or return None when it contains LaTeX math
+    (cached, as history is displayed on every rerun).
+    Streamlit parses the HTML as markdown again, where a blank line ends an HTML
+    block, so newlines in preformatted text are written as character references.
+    """
+    tokens = _markdown.parse(text)
+    for token in tokens:
+        if token.type.startswith("math") or any(
+            child.type.startswith("math") for child in token.children or ()
+        ):
+            return None
+    html = _markdown.renderer.render(tokens, _markdown.options, {})
+    return _PRE_BLOCK.sub(lambda m: m.group().replace("\n", "&#10;"), html)
+
 
-    if stream:
-        response_container = st.empty()
-        stream_text(response_text, response_container, delay=0.005)
+def fast_markdown_html(text):
+    """
+    Return complete markdown text rendered to HTML on the server, or None when it
+    must go through the browser's slower markdown pipeline (fast markdown is
+    disabled, or the text contains math).
+    """
+    if not st.session_state.get("fast_markdown", True):
+        return None
+    return render_md(text)
+
+
+def show_markdown(text, container=st):
+    """Display complete markdown text, rendered on the server when possible."""
+    html = fast_markdown_html(text)
+    if html is None:
+        container.markdown(text)
     else:
+        container.markdown(html, unsafe_allow_html=True)
+
+
+# Minimum time between two updates of streamed text (one frame at 60 fps), and
+# minimum number of new characters per update
+STREAM_INTERVAL = 0.016
+STREAM_MIN_CHARS = 12
+
+_FENCE = re.compile(r"(`{3,}|~{3,})")
+
+
+def split_markdown_blocks(text):
+    """
+    Split markdown text into completed blocks and the trailing block that may still
+    grow. A block ends at a blank line or a closed code fence, unless the next line
+    is indented, continuing it (e.g. a list item's next paragraph).
+    """
+    blocks, current = [], []
+    fence = None  # Opening marker of the code fence being read
+    ended = False  # Whether the current block ends, unless the next line continues it
+    for line in text.splitlines(keepends=True):
+        if fence is not None:
+            current.append(line)
+            closing = line.strip()
+            if closing.startswith(fence) and not closing.strip(fence[0]):
+                fence, ended = None, True
+            continue
+        if not line.strip():
+            if current:
+                current.append(line)
+                ended = True
+            continue
+
+        if ended and not line[0].isspace():
+            blocks.append("".join(current))
+            current = []
+        ended = False
+        current.append(line)
+        if not line.endswith("\n"):
+            # Last line, still being typed
+            break
+        opening = _FENCE.match(line.lstrip())
+        if opening:
+            fence = opening.group(1)
+    return blocks, "".join(current)
+
+
+class StreamedMarkdown:
+    """
+    Markdown text displayed in a container while it grows.
+    Completed blocks are rendered once into their own placeholder, so that each
+    update only re-renders the last block. Updates are debounced: they are skipped
+    until STREAM_INTERVAL seconds have passed and STREAM_MIN_CHARS characters
+    have been added since the previous one.
+    """
+
+    def __init__(self, container):
+        self._blocks = container.container()
+        self._trailing_slot = self._blocks.empty()
+        self._offset = 0  # Length of the text already rendered as completed blocks
+        self._length = 0  # Length of the text displayed so far
+        self._last_update = 0.0
+
+    def update(self, text, force=False):
+        """Display the text so far, unless debounced (force always displays it)."""
+        if not force and (
+            len(text) - self._length < STREAM_MIN_CHARS
+            or time.monotonic() - self._last_update < STREAM_INTERVAL
+        ):
+            return
+
+        blocks, trailing = split_markdown_blocks(text[self._offset :])
+        for block in blocks:
+            self._trailing_slot.markdown(block)
+            self._trailing_slot = self._blocks.empty()
+        self._offset = len(text) - len(trailing)
+        self._trailing_slot.markdown(trailing)
+
+        self._length = len(text)
+        self._last_update = time.monotonic()
+
+
+def stream_text(text, container, delay=0.01):
+    """
+    Stream text to a container, typed at `delay` seconds per character.
+    The container is updated in batches of characters, at most every
+    STREAM_INTERVAL seconds, and finally displays the whole text at once, as
+    blocks rendered separately may not render like the whole text.
+    """
+    if delay <= 0:
+        show_markdown(text, container)
+        return text
+
+    stream = StreamedMarkdown(container)
+    batch = max(STREAM_MIN_CHARS, round(STREAM_INTERVAL / delay))
+    for end in range(batch, len(text), batch):
+        started = time.monotonic()
+        stream.update(text[:end], force=True)
+        time.sleep(max(0.0, batch * delay - (time.monotonic() - started)))
+
+    show_markdown(text, container)
+    return text
+
+
+def display_agent_response(agent_name, response_text):
+    """Display an agent's completed response"""
+    header = f'<div class="agent-name">🤖 {agent_name}</div>'
+    html = fast_markdown_html(response_text)
+    if html is not None:
+        # Written once, as a single element wrapping the whole response
+        st.markdown(
+            f'<div class="agent-response">{header}{html}</div>',
+            unsafe_allow_html=True,
+        )
+    else:
+        st.markdown(header, unsafe_allow_html=True)
         st.markdown(response_text)
 
 
+def display_agent_responses(agents, query, debug=False, stream=True, use_cache=True):
+    """
+    Query all agents concurrently, displaying their responses in agent order.
+    Agents run in a thread pool and report their tokens and completion through a
+    queue, as only the script thread can update the page. With use_cache=False,
+    cached responses to similar queries are ignored.
+    Returns the agents' response dicts, in agent order.
+    """
+    # One placeholder per agent, so that the display order does not depend on timing.
+    # HTML can't wrap other elements, so each agent is framed by a bordered container.
+    slots = []
+    for agent in agents:
+        with st.container(border=True):
+            st.markdown(
+                f'<div class="agent-name">🤖 {agent.name}</div>',
+                unsafe_allow_html=True,
+            )
+            slot = st.empty()
+            slot.info(f"⏳ {agent.name} is analyzing...")
+        slots.append(slot)
+
+    events = queue.Queue()  # (agent index, token), with a None token once done
+    # Agents run in copies of this context, which holds the question's tool cache
+    with ContextThreadPoolExecutor(max_workers=len(agents)) as executor:
+        futures = []
+        for i, agent in enumerate(agents):
+            on_token = (lambda token, i=i: events.put((i, token))) if stream else None
+            future = executor.submit(
+                agent.respond,
+                query,
+                debug=debug,
+                on_token=on_token,
+                use_cache=use_cache,
+            )
+            future.add_done_callback(lambda _, i=i: events.put((i, None)))
+            futures.append(future)
+
+        texts = [""] * len(agents)
+        # Streamed displays are created on the first token, replacing the status
+        streams = [None] * len(agents)
+        remaining = len(agents)
+        while remaining:
+            i, token = events.get()
+            if token is not None:
+                texts[i] += token
+                if streams[i] is None:
+                    streams[i] = StreamedMarkdown(slots[i])
+                streams[i].update(texts[i])
+                continue
+
+            # Replace the streamed text, which may include tool-calling turns
+            remaining -= 1
+            response = futures[i].result()
+            if response["success"]:
+                show_markdown(response["response"], slots[i])
+            else:
+                slots[i].error(response["response"])
+
+    return [future.result() for future in futures]
+
+
 def display_deliberation(evaluation):
-    """Display the deliberation results"""
-    st.markdown('<div class="deliberation-section">', unsafe_allow_html=True)
-    st.markdown("### ⚖️ MAGI DELIBERATION")
+    """Display the deliberation results, if there are any"""
+    evaluations = getattr(evaluation, "evaluations", None)
+    synthesis = getattr(evaluation, "synthesis", None)
+    if not evaluations and not synthesis:
+        # e.g. an unscored evaluation, when the answer was synthesised directly
+        return
 
-    if hasattr(evaluation, "evaluations") and evaluation.evaluations:
+    st.markdown(
+        '<div class="deliberation-section"><h3>⚖️ MAGI DELIBERATION</h3></div>',
+        unsafe_allow_html=True,
+    )
+
+    if evaluations:
         st.markdown("#### Individual Scores:")
 
-        cols = st.columns(len(evaluation.evaluations))
-        for idx, eval_item in enumerate(evaluation.evaluations):
+        cols = st.columns(len(evaluations))
+        for idx, eval_item in enumerate(evaluations):
             with cols[idx]:
                 score = eval_item.score
                 agent = eval_item.agent
@@ -129,25 +343,61 @@ def display_deliberation(evaluation):
                 with st.expander("View reasoning"):
                     st.write(reasoning)
 
-    if hasattr(evaluation, "synthesis") and evaluation.synthesis:
+    if synthesis:
         st.markdown("#### Synthesis:")
-        st.info(evaluation.synthesis)
-
-    st.markdown("</div>", unsafe_allow_html=True)
+        st.info(synthesis)
 
 
 def display_final_answer(final_answer, stream=True):
     """Display the final synthesized answer"""
-    st.markdown('<div class="final-answer">', unsafe_allow_html=True)
-    st.markdown("### ✅ FINAL SYNTHESIZED ANSWER")
+    html = None if stream else fast_markdown_html(final_answer)
+    if html is not None:
+        # Written once, as a single element wrapping the whole answer
+        st.markdown(
+            '<div class="final-answer"><h3>✅ FINAL SYNTHESIZED ANSWER</h3>'
+            f"{html}</div>",
+            unsafe_allow_html=True,
+        )
+        return
+
+    # Streamed or browser-rendered answers are framed by a bordered container
+    with st.container(border=True):
+        st.markdown("### ✅ FINAL SYNTHESIZED ANSWER")
+
+        if stream:
+            answer_container = st.empty()
+            stream_text(final_answer, answer_container, delay=0.005)
+        else:
+            show_markdown(final_answer)
+
+
+def clear_chat_history():
+    """Clear the chat history, and which of its entries were opened"""
+    for idx in range(len(st.session_state.chat_history)):
+        st.session_state.pop(f"open_{idx}", None)
+    st.session_state.chat_history = []
 
-    if stream:
-        answer_container = st.empty()
-        stream_text(final_answer, answer_container, delay=0.005)
-    else:
-        st.markdown(final_answer)
 
-    st.markdown("</div>", unsafe_allow_html=True)
+def display_history_entry(item):
+    """Display a past query with its responses, deliberation and final answer"""
+    st.markdown(f"**📝 Question:** {item['question']}")
+    asked_at = datetime.fromtimestamp(item["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+    st.markdown(f"**🕒 Time:** {asked_at}")
+
+    st.markdown("---")
+    st.markdown("#### Agent Responses:")
+
+    for response in item["agent_responses"]:
+        if response["success"]:
+            display_agent_response(response["agent"], response["response"])
+        else:
+            st.error(f"**{response['agent']}:** {response['response']}")
+
+    st.markdown("---")
+    display_deliberation(item["evaluation"])
+
+    st.markdown("---")
+    display_final_answer(item["final_answer"], stream=False)
 
 
 def main():
@@ -208,7 +458,7 @@ def main():
 
         if st.session_state.initialized:
             if st.button("🗑️ Clear Chat History", use_container_width=True):
-                st.session_state.chat_history = []
+                clear_chat_history()
                 st.rerun()
 
             if st.button("🔄 Clear Agent Memory", use_container_width=True):
@@ -216,9 +466,14 @@ def main():
                 st.success("Agent memory cleared!")
 
             if st.button("♻️ Restart System", use_container_width=True):
+                # Reopen the knowledge base, which may have been re-ingested
+                if st.session_state.magi_system.enable_rag:
+                    from tools.rag_tool import RAGTool
+
+                    RAGTool.close_all()
                 st.session_state.magi_system = None
                 st.session_state.initialized = False
-                st.session_state.chat_history = []
+                clear_chat_history()
                 st.session_state.enable_search = True
                 st.session_state.enable_rag = False
                 st.rerun()
@@ -230,6 +485,20 @@ def main():
 
         st.session_state.stream_responses = stream_responses
         st.session_state.stream_final = stream_final
+        st.session_state.fast_markdown = st.checkbox(
+            "Fast Markdown",
+            value=True,
+            help="Render complete responses to HTML on the server (responses "
+            "containing LaTeX math are still rendered by the browser)",
+        )
+
+        st.markdown("### Cache Options")
+        st.session_state.disable_cache = st.checkbox(
+            "Disable Response Cache",
+            value=False,
+            help="Query the agents and deliberate even when a similar question was "
+            "already answered",
+        )
 
     # Main content
     st.title("🤖 MAGI System")
@@ -251,35 +520,19 @@ def main():
         st.markdown("---")
         st.markdown("## 💬 Conversation History")
 
+        last_idx = len(st.session_state.chat_history) - 1
         for idx, item in enumerate(st.session_state.chat_history):
+            # Only the latest entry, and older ones the user asked for, are rendered
+            is_open = idx == last_idx or st.session_state.get(f"open_{idx}", False)
             with st.expander(
                 f"Query {idx + 1}: {item['question'][:60]}...",
-                expanded=(idx == len(st.session_state.chat_history) - 1),
+                expanded=is_open,
             ):
-                st.markdown(f"**📝 Question:** {item['question']}")
-                st.markdown(f"**🕒 Time:** {item['timestamp']}")
-
-                st.markdown("---")
-                st.markdown("#### Agent Responses:")
-
-                for response in item["agent_responses"]:
-                    if response["success"]:
-                        with st.container():
-                            st.markdown(
-                                f'<div class="agent-response">', unsafe_allow_html=True
-                            )
-                            display_agent_response(
-                                response["agent"], response["response"], stream=False
-                            )
-                            st.markdown("</div>", unsafe_allow_html=True)
-                    else:
-                        st.error(f"**{response['agent']}:** {response['response']}")
-
-                st.markdown("---")
-                display_deliberation(item["evaluation"])
-
-                st.markdown("---")
-                display_final_answer(item["final_answer"], stream=False)
+                if is_open:
+                    display_history_entry(item)
+                elif st.button("Show full response", key=f"show_{idx}"):
+                    st.session_state[f"open_{idx}"] = True
+                    st.rerun()
 
     # Query input section
     st.markdown("---")
@@ -315,36 +568,22 @@ def main():
             # Query each agent with streaming
             st.markdown("### 🤖 Agent Responses")
 
-            responses = []
-            for agent in st.session_state.magi_system.agents:
-                with st.container():
-                    st.markdown(f'<div class="agent-response">', unsafe_allow_html=True)
-
-                    status_container = st.empty()
-                    status_container.info(f"⏳ {agent.name} is analyzing...")
+            st.session_state.magi_system.tool_cache.new_question()
+            use_cache = not st.session_state.get("disable_cache", False)
 
-                    # Get response with optional debug mode
-                    response = agent.respond(query, debug=debug_mode)
-                    responses.append(response)
-
-                    status_container.empty()
-
-                    if response["success"]:
-                        display_agent_response(
-                            response["agent"],
-                            response["response"],
-                            stream=st.session_state.get("stream_responses", True),
-                        )
-                    else:
-                        st.error(f"**{response['agent']}:** {response['response']}")
-
-                    st.markdown("</div>", unsafe_allow_html=True)
+            responses = display_agent_responses(
+                st.session_state.magi_system.agents,
+                query,
+                debug=debug_mode,
+                stream=st.session_state.get("stream_responses", True),
+                use_cache=use_cache,
+            )
 
             # Deliberation
             st.markdown("---")
             with st.spinner("⚖️ Deliberating..."):
                 result = st.session_state.magi_system.deliberator.process_magi_decision(
-                    query, responses
+                    query, responses, use_cache=use_cache
                 )
 
             display_deliberation(result.evaluation)
@@ -359,7 +598,7 @@ def main():
             # Save to history
             chat_entry = {
                 "question": query,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "timestamp": time.time(),  # Formatted only when displayed
                 "agent_responses": responses,
                 "evaluation": result.evaluation,
                 "final_answer": result.final_answer,
@@ -0,0 +1,57 @@
+"""
+Tests for the batch tool.
+"""
+
+import sys
+
+sys.path.append("..")
+from langchain_core.tools import Tool
+
+from tools.batch_tool import get_batch_tool
+
+
+def make_tool(name):
+    return Tool(name=name, description=name, func=lambda q: f"{name} result for {q}")
+
+
+def test_runs_all_invocations():
+    batch = get_batch_tool([make_tool("search"), make_tool("knowledge_base_search")])
+    result = batch.invoke(
+        {
+            "invocations": [
+                {"tool_name": "search", "query": "dogs"},
+                {"tool_name": "knowledge_base_search", "query": "cats"},
+            ]
+        }
+    )
+
+    assert "search result for dogs" in result
+    assert "knowledge_base_search result for cats" in result
+
+
+def test_unknown_tool_reports_error():
+    batch = get_batch_tool([make_tool("search")])
+    result = batch.invoke(
+        {"invocations": [{"tool_name": "calculator", "query": "1 + 1"}]}
+    )
+
+    assert "Unknown tool" in result
+
+
+def test_tool_queries_are_prefetched_together():
+    prefetched = []
+    tool = make_tool("knowledge_base_search")
+    tool.metadata = {"prefetch": prefetched.append}
+    batch = get_batch_tool([tool, make_tool("search")])
+    batch.invoke(
+        {
+            "invocations": [
+                {"tool_name": "knowledge_base_search", "query": "dogs"},
+                {"tool_name": "search", "query": "dogs"},
+                {"tool_name": "knowledge_base_search", "query": "cats"},
+                {"tool_name": "knowledge_base_search", "query": "dogs"},
+            ]
+        }
+    )
+
+    assert prefetched == [["dogs", "cats"]]
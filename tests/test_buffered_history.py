@@ -0,0 +1,84 @@
+"""
+Tests for the buffered chat history.
+"""
+
+import sys
+import threading
+
+sys.path.append("..")
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents.db import BufferedChatHistory, get_writer
+
+
+DB_PATH = "sqlite:///test_buffered_history.db"
+
+
+class CountingHistory(InMemoryChatMessageHistory):
+    """In-memory history recording how many writes were made."""
+
+    writes: int = 0
+
+    def add_messages(self, messages):
+        self.writes += 1
+        super().add_messages(messages)
+
+
+def test_added_messages_are_stored():
+    store = CountingHistory()
+    history = BufferedChatHistory(store, DB_PATH)
+    history.add_messages([HumanMessage(content="hi"), AIMessage(content="hello")])
+    history.flush()
+
+    assert [m.content for m in store.messages] == ["hi", "hello"]
+    assert [m.content for m in history.messages] == ["hi", "hello"]
+
+
+def test_queued_messages_are_written_together():
+    store = CountingHistory()
+    history = BufferedChatHistory(store, DB_PATH)
+
+    # Keep the writer busy while messages are added
+    release = threading.Event()
+    get_writer(DB_PATH).submit(release.wait)
+    for text in ["a", "b", "c"]:
+        history.add_messages([HumanMessage(content=text)])
+    release.set()
+    history.flush()
+
+    assert store.writes == 1
+    assert [m.content for m in store.messages] == ["a", "b", "c"]
+
+
+def test_reads_come_from_memory_after_first_load():
+    store = CountingHistory(messages=[HumanMessage(content="old")])
+    history = BufferedChatHistory(store, DB_PATH)
+    assert [m.content for m in history.messages] == ["old"]
+
+    store.messages = []
+    history.add_messages([HumanMessage(content="new")])
+
+    assert [m.content for m in history.messages] == ["old", "new"]
+
+
+def test_memory_keeps_most_recent_messages():
+    store = CountingHistory()
+    history = BufferedChatHistory(store, DB_PATH, max_messages=2)
+    history.messages
+    for text in ["a", "b", "c"]:
+        history.add_messages([HumanMessage(content=text)])
+    history.flush()
+
+    assert [m.content for m in history.messages] == ["b", "c"]
+    assert len(store.messages) == 3
+
+
+def test_clear_removes_stored_messages():
+    store = CountingHistory()
+    history = BufferedChatHistory(store, DB_PATH)
+    history.add_messages([HumanMessage(content="hi")])
+    history.clear()
+
+    assert store.messages == []
+    assert history.messages == []
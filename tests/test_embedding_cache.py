@@ -0,0 +1,54 @@
+"""
+Tests for the persistent embedding cache.
+"""
+
+import sys
+
+sys.path.append("..")
+from tools.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings:
+    """Fake embeddings recording how many texts were embedded."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_seen_text_is_not_re_embedded(tmp_path):
+    embeddings = CountingEmbeddings()
+    cache = CachedEmbeddings(embeddings, "model", str(tmp_path / "cache.db"))
+
+    first = cache.embed_documents(["a dog", "a cat"])
+    second = cache.embed_documents(["a cat", "a bird", "a dog"])
+
+    assert second[0] == first[1] and second[2] == first[0]
+    assert embeddings.embedded == ["a dog", "a cat", "a bird"]
+
+
+def test_cache_persists_across_instances(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    CachedEmbeddings(CountingEmbeddings(), "model", db_path).embed_query("a dog")
+
+    embeddings = CountingEmbeddings()
+    vector = CachedEmbeddings(embeddings, "model", db_path).embed_query("a dog")
+
+    assert vector == [5.0, 1.0]
+    assert embeddings.embedded == []
+
+
+def test_model_change_invalidates_cache(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    CachedEmbeddings(CountingEmbeddings(), "old-model", db_path).embed_query("a dog")
+
+    embeddings = CountingEmbeddings()
+    CachedEmbeddings(embeddings, "new-model", db_path).embed_query("a dog")
+
+    assert embeddings.embedded == ["a dog"]
@@ -7,6 +7,7 @@ import sys
 sys.path.append("..")
 from langchain_openai import OpenAIEmbeddings
 
+from agents.llm import get_http_clients
 from config import LM_STUDIO_API_KEY, LM_STUDIO_URL, RAG_EMBEDDING_MODEL
 
 
@@ -20,11 +21,14 @@ def test_embeddings():
 
     # Initialise embeddings
     try:
+        http_client, http_async_client = get_http_clients(LM_STUDIO_URL)
         embeddings = OpenAIEmbeddings(
             model=RAG_EMBEDDING_MODEL,
             base_url=LM_STUDIO_URL,
             api_key=LM_STUDIO_API_KEY,
             check_embedding_ctx_length=False,
+            http_client=http_client,
+            http_async_client=http_async_client,
         )
         print("✓ Embeddings initialised successfully")
     except Exception as e:
@@ -0,0 +1,234 @@
+"""
+Tests for document loading during ingestion.
+"""
+
+import os
+import sys
+import threading
+
+sys.path.append("..")
+from langchain_core.documents import Document
+
+import ingest_documents
+from ingest_documents import (
+    _add_in_batches,
+    _batch_documents,
+    _clean_documents,
+    _find_files,
+    _load_all,
+    _stream_documents,
+)
+
+
+class FakeVectorStore:
+    """Vector store recording added batches, rejecting any containing "bad"."""
+
+    def __init__(self):
+        self.batches = []
+        self.ids = {}
+
+    def add_documents(self, documents, ids=None):
+        if any(d.page_content == "bad" for d in documents):
+            raise ValueError("Rejected document")
+        self.batches.append([d.page_content for d in documents])
+        self.ids.update(zip(ids, (d.page_content for d in documents)))
+
+    def get(self, ids, include):
+        return {"ids": [i for i in ids if i in self.ids]}
+
+
+def test_files_load_in_order_with_worker_processes(tmp_path):
+    paths = []
+    for name in ["a", "b", "c"]:
+        path = tmp_path / f"{name}.txt"
+        path.write_text(f"Document {name}")
+        paths.append(str(path))
+
+    loaded = list(_load_all(paths, chunk_size=100, chunk_overlap=0, num_workers=2))
+
+    assert [[c.page_content for c in chunks] for chunks in loaded] == [
+        ["Document a"],
+        ["Document b"],
+        ["Document c"],
+    ]
+    assert loaded[1][0].metadata["source"] == paths[1]
+
+
+def test_missing_and_unsupported_files_are_skipped(tmp_path):
+    unsupported = tmp_path / "data.csv"
+    unsupported.write_text("x,y")
+
+    loaded = list(
+        _load_all(
+            [str(tmp_path / "missing.txt"), str(unsupported)],
+            chunk_size=100,
+            chunk_overlap=0,
+            num_workers=1,
+        )
+    )
+
+    assert loaded == [[], []]
+
+
+def test_failing_batch_is_retried_one_by_one():
+    store = FakeVectorStore()
+    documents = [Document(page_content=t) for t in ["a", "b", "bad", "c", "d"]]
+
+    added = _add_in_batches(
+        store, documents, batch_size=2, max_workers=1, verbose=False
+    )
+
+    assert added == 4
+    assert store.batches == [["a", "b"], ["c"], ["d"]]
+
+
+def test_batches_are_added_concurrently():
+    store = FakeVectorStore()
+    documents = [Document(page_content=str(i)) for i in range(10)]
+
+    added = _add_in_batches(
+        store, documents, batch_size=3, max_workers=4, verbose=False
+    )
+
+    assert added == 10
+    assert sorted(store.batches) == [
+        ["0", "1", "2"],
+        ["3", "4", "5"],
+        ["6", "7", "8"],
+        ["9"],
+    ]
+
+
+def test_identical_chunks_share_a_batch():
+    documents = [
+        Document(page_content=t, metadata={"page": i})
+        for i, t in enumerate(["header", "a", "b", "header", "c", "header"])
+    ]
+
+    batches = list(_batch_documents(documents, batch_size=2, window_batches=3))
+
+    assert [[d.page_content for d in batch] for batch in batches] == [
+        ["header", "header", "header"],
+        ["a", "b"],
+        ["c"],
+    ]
+    assert [d.metadata["page"] for d in batches[0][:3]] == [0, 3, 5]
+
+
+def test_files_are_found_by_extension(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for name in ["a.txt", "b.PDF", "c.csv", "sub/d.md"]:
+        (tmp_path / name).write_text("x")
+
+    def found(recursive):
+        paths = _find_files(str(tmp_path), [".txt", ".pdf", ".md"], recursive)
+        return sorted(os.path.relpath(p, tmp_path) for p in paths)
+
+    assert found(recursive=True) == ["a.txt", "b.PDF", os.path.join("sub", "d.md")]
+    assert found(recursive=False) == ["a.txt", "b.PDF"]
+    assert _find_files(str(tmp_path / "missing"), [".txt"], recursive=True) == []
+
+
+def test_documents_are_cleaned_in_place():
+    documents = [
+        Document(page_content="  text \n", metadata={"page": 1, "tags": ["a"]}),
+        Document(page_content="   ", metadata={}),
+    ]
+
+    cleaned = _clean_documents(documents)
+
+    assert cleaned == [documents[0]]
+    assert cleaned[0].page_content == "text"
+    assert cleaned[0].metadata == {"page": 1, "tags": "['a']"}
+
+
+def test_documents_are_streamed_cleaned_and_in_order(tmp_path):
+    paths = []
+    for name in ["a", "b", "c"]:
+        path = tmp_path / f"{name}.txt"
+        path.write_text(f"  Document {name}  ")
+        paths.append(str(path))
+    paths.append(str(tmp_path / "missing.txt"))
+
+    streamed = _stream_documents(
+        paths, chunk_size=100, chunk_overlap=0, num_workers=2, max_pending=1
+    )
+
+    assert [d.page_content for d in streamed] == [
+        "Document a",
+        "Document b",
+        "Document c",
+    ]
+
+
+def test_reingested_documents_keep_their_ids():
+    store = FakeVectorStore()
+
+    def documents():
+        return [
+            Document(page_content="header", metadata={"source": "a.txt"}),
+            Document(page_content="header", metadata={"source": "a.txt"}),
+            Document(page_content="header", metadata={"source": "b.txt"}),
+        ]
+
+    assert _add_in_batches(store, documents(), max_workers=1, verbose=False) == 2
+    first_ids = dict(store.ids)
+    added_again = _add_in_batches(store, documents(), max_workers=1, verbose=False)
+
+    assert len(first_ids) == 2
+    assert store.ids == first_ids
+    assert added_again == 0
+    assert len(store.batches) == 1
+
+
+def write_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"{i}.txt"
+        path.write_text(f"Document {i}")
+        paths.append(str(path))
+    return paths
+
+
+def assert_loader_stopped():
+    for thread in threading.enumerate():
+        if thread.name == "magi-ingest-loader":
+            thread.join(timeout=10)
+            assert not thread.is_alive()
+
+
+def test_closing_the_stream_stops_loading(tmp_path):
+    paths = write_files(tmp_path, 12)
+
+    for num_workers in (1, 2):
+        documents = _stream_documents(
+            paths, 100, chunk_overlap=0, num_workers=num_workers, max_pending=1
+        )
+        assert next(documents).page_content == "Document 0"
+        documents.close()
+        assert_loader_stopped()
+
+
+def test_failed_vector_store_leaves_no_loader(tmp_path, monkeypatch):
+    def fail(**kwargs):
+        raise ValueError("Cannot open collection")
+
+    monkeypatch.setattr(ingest_documents, "_get_embeddings", lambda *args: None)
+    monkeypatch.setattr(ingest_documents, "Chroma", fail)
+
+    assert ingest_documents.ingest_documents(write_files(tmp_path, 3)) == 0
+    assert_loader_stopped()
+
+
+def test_failed_ingestion_stops_loading(tmp_path, monkeypatch):
+    def fail(vectorstore, documents, verbose):
+        next(iter(documents))
+        raise ValueError("Cannot add documents")
+
+    monkeypatch.setattr(ingest_documents, "_get_embeddings", lambda *args: None)
+    monkeypatch.setattr(ingest_documents, "Chroma", lambda **kwargs: FakeVectorStore())
+    monkeypatch.setattr(ingest_documents, "_add_in_batches", fail)
+
+    paths = write_files(tmp_path, 12)
+    assert ingest_documents.ingest_documents(paths, num_workers=2) == 0
+    assert_loader_stopped()
@@ -0,0 +1,115 @@
+"""
+Tests for the in-process embeddings.
+"""
+
+import os
+import sys
+import types
+
+sys.path.append("..")
+from tools import local_embeddings
+from tools.local_embeddings import LocalEmbeddings
+
+
+class FakeArray(list):
+    """List standing in for the numpy array returned by encode."""
+
+    def tolist(self):
+        return list(self)
+
+
+class FakeModel:
+    """Fake sentence-transformers model recording its encode calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy):
+        self.calls.append((texts, batch_size, normalize_embeddings))
+        return FakeArray([float(len(t)), 1.0] for t in texts)
+
+
+def test_texts_are_embedded_in_one_call(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(
+        local_embeddings, "_load_model", lambda name, device, precision: (model, "fp32")
+    )
+    embeddings = LocalEmbeddings("model", batch_size=8)
+
+    vectors = embeddings.embed_documents(["a dog", "a cat"])
+    query = embeddings.embed_query("a bird")
+
+    assert vectors == [[5.0, 1.0], [5.0, 1.0]]
+    assert query == [6.0, 1.0]
+    assert model.calls == [(["a dog", "a cat"], 8, True), (["a bird"], 8, True)]
+
+
+def test_missing_dependency_is_reported(monkeypatch):
+    local_embeddings._load_model.cache_clear()
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+
+    try:
+        local_embeddings._load_model("model", "cpu")
+    except ImportError as e:
+        assert "sentence-transformers" in str(e)
+    else:
+        raise AssertionError("ImportError not raised")
+
+
+def test_model_id_includes_reduced_precision(monkeypatch):
+    monkeypatch.setattr(
+        local_embeddings, "_load_model", lambda name, device, precision: (None, "int8")
+    )
+
+    assert LocalEmbeddings("model", precision="int8").model_id == "model:int8"
+
+
+def test_arm_cpus_use_the_arm64_export(monkeypatch):
+    monkeypatch.setattr(local_embeddings.platform, "machine", lambda: "arm64")
+
+    assert local_embeddings._quantization_config() == "arm64"
+
+
+class FakeSentenceTransformer:
+    """Model published without int8 exports, saved and loaded from local paths."""
+
+    loaded = []
+
+    def __init__(self, name, device, backend="torch", model_kwargs=None):
+        file_name = (model_kwargs or {}).get("file_name")
+        if file_name and not os.path.exists(os.path.join(name, file_name)):
+            raise FileNotFoundError(file_name)
+        self.name = name
+        FakeSentenceTransformer.loaded.append((name, file_name))
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+
+
+def fake_quantize(model, config, path):
+    os.makedirs(os.path.join(path, "onnx"), exist_ok=True)
+    open(os.path.join(path, "onnx", f"model_qint8_{config}.onnx"), "w").close()
+    fake_quantize.calls += 1
+
+
+def test_models_without_int8_export_are_quantized_once(tmp_path, monkeypatch):
+    fake_module = types.ModuleType("sentence_transformers")
+    fake_module.SentenceTransformer = FakeSentenceTransformer
+    fake_module.export_dynamic_quantized_onnx_model = fake_quantize
+    fake_quantize.calls = 0
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_module)
+    monkeypatch.setattr(
+        local_embeddings, "RAG_LOCAL_EMBEDDING_CACHE_DIR", str(tmp_path)
+    )
+    monkeypatch.setattr(local_embeddings, "_quantization_config", lambda: "avx2")
+
+    first = local_embeddings._int8_model("org/model", "cpu")
+    second = local_embeddings._int8_model("org/model", "cpu")
+
+    local_path = str(tmp_path / "org--model")
+    assert first.name == second.name == local_path
+    assert FakeSentenceTransformer.loaded[-1] == (
+        local_path,
+        "onnx/model_qint8_avx2.onnx",
+    )
+    assert fake_quantize.calls == 1
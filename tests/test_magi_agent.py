@@ -0,0 +1,69 @@
+"""
+Tests for MAGI agents, with a stub agent run in place of the LLM.
+"""
+
+import sys
+
+sys.path.append("..")
+from langchain_core.messages import AIMessage
+
+from agents.magi_agent import MagiAgent
+from agents.response_cache import ProximityCache
+
+
+class StubRun:
+    """Agent run answering every query with a new numbered answer."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def stream(self, inputs, stream_mode):
+        self.calls += 1
+        yield "values", {"messages": [AIMessage(content=f"Answer {self.calls}")]}
+
+
+def make_agent(tmp_path, session_id, response_cache, run):
+    agent = MagiAgent(
+        name="Melchior",
+        system_prompt="You are a scientist.",
+        session_id=session_id,
+        llm_provider="lm_studio",
+        llm_base_url="http://127.0.0.1:1/v1",
+        model_name="test-model",
+        api_key="lm-studio",
+        temperature=0.0,
+        memory_db_path=f"sqlite:///{tmp_path / 'history.db'}",
+        rag_collection="test",
+        enable_rag=False,
+        enable_search=False,
+        response_cache=response_cache,
+    )
+    agent.agent = run
+    return agent
+
+
+def test_follow_up_is_not_served_from_another_conversation(tmp_path):
+    cache, run = ProximityCache(), StubRun()
+    dogs = make_agent(tmp_path, "dogs", cache, run)
+    cats = make_agent(tmp_path, "cats", cache, run)
+
+    dogs.respond("Tell me about dogs.")
+    why_dogs = dogs.respond("Why?")
+    cats.respond("Tell me about cats.")
+    why_cats = cats.respond("Why?")
+
+    assert why_cats["response"] != why_dogs["response"]
+    assert "cache_hit" not in why_cats
+    assert run.calls == 4
+
+
+def test_same_question_in_same_context_is_cached(tmp_path):
+    cache, run = ProximityCache(), StubRun()
+    first = make_agent(tmp_path, "first", cache, run)
+    second = make_agent(tmp_path, "second", cache, run)
+
+    answer = first.respond("Tell me about dogs.")
+    cached = second.respond("Tell me about dogs.")
+
+    assert cached == {**answer, "cache_hit": True}
+    assert run.calls == 1
@@ -0,0 +1,234 @@
+"""
+Tests for the MAGI deliberator, with stub LLMs in place of the model server.
+"""
+
+import asyncio
+import sys
+
+sys.path.append("..")
+from langchain_core.messages import AIMessage
+
+from agents.magi_deliberator import DeliberatorAgent
+
+RESPONSES = [
+    {"agent": "Melchior", "response": "Cats are independent pets.", "success": True},
+    {"agent": "Balthasar", "response": "Dogs are loyal companions.", "success": True},
+    {"agent": "Casper", "response": "Fish need little attention.", "success": True},
+]
+
+DELIBERATION = {
+    "evaluations": [
+        {"agent": "Melchior", "score": 7, "reasoning": "Clear."},
+        {"agent": "Balthasar", "score": 8, "reasoning": "Warm."},
+        {"agent": "Casper", "score": 6, "reasoning": "Brief."},
+    ],
+    "synthesis": "Each pet suits a different owner.",
+    "voting_result": "Balthasar",
+    "final_answer": "Pick the pet that suits your lifestyle.",
+}
+
+
+class StubLLM:
+    """Return a fixed result, or raise it if it is an exception, counting calls."""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+
+def make_deliberator(tmp_path, deliberation, answer="Synthesised answer.", **kwargs):
+    deliberator = DeliberatorAgent(
+        llm_provider="lm_studio",
+        llm_base_url="http://127.0.0.1:1/v1",
+        model_name="test-model",
+        api_key="lm-studio",
+        temperature=0.0,
+        session_id="test",
+        memory_db_path=f"sqlite:///{tmp_path / 'history.db'}",
+        **kwargs,
+    )
+    deliberator.deliberation_llm = StubLLM(deliberation)
+    deliberator.llm = StubLLM(AIMessage(content=answer))
+    return deliberator
+
+
+def test_combined_call_scores_and_answers(tmp_path):
+    deliberator = make_deliberator(tmp_path, DELIBERATION)
+
+    result = deliberator.process_magi_decision("Which pet?", RESPONSES)
+
+    assert result.final_answer == DELIBERATION["final_answer"]
+    assert [e.score for e in result.evaluation.evaluations] == [7, 8, 6]
+    assert deliberator.deliberation_llm.calls == 1
+    assert deliberator.llm.calls == 0
+
+
+def test_failed_combined_call_falls_back_to_synthesis(tmp_path):
+    deliberator = make_deliberator(tmp_path, ValueError("bad output"))
+
+    result = deliberator.deliberate("Which pet?", RESPONSES)
+
+    assert result.evaluation.voting_result == "Error"
+    assert result.final_answer == "Synthesised answer."
+    assert deliberator.llm.calls == 1
+
+
+def test_async_fallback_matches_sync(tmp_path):
+    deliberator = make_deliberator(tmp_path, ValueError("bad output"))
+
+    result = asyncio.run(deliberator.adeliberate("Which pet?", RESPONSES))
+
+    assert result.final_answer == "Synthesised answer."
+    assert deliberator.llm.calls == 1
+
+
+def test_evaluation_never_synthesises(tmp_path):
+    deliberator = make_deliberator(tmp_path, ValueError("bad output"))
+
+    evaluation = deliberator.evaluate_responses("Which pet?", RESPONSES)
+    async_evaluation = asyncio.run(
+        deliberator.aevaluate_responses("Which pet?", RESPONSES)
+    )
+
+    assert evaluation.voting_result == async_evaluation.voting_result == "Error"
+    assert deliberator.deliberation_llm.calls == 2
+    assert deliberator.llm.calls == 0
+
+
+class ByteEncoding:
+    """Tokeniser stub with one token per UTF-8 byte, the most tiktoken produces."""
+
+    def encode(self, text, disallowed_special=()):
+        return list(text.encode())
+
+    def decode(self, tokens):
+        return bytes(tokens).decode(errors="replace")
+
+
+def test_out_of_range_scores_are_clamped(tmp_path):
+    deliberation = dict(
+        DELIBERATION,
+        evaluations=[
+            {"agent": "Melchior", "score": 11, "reasoning": "Too high."},
+            {"agent": "Balthasar", "score": 0, "reasoning": "Too low."},
+            {"agent": "Casper", "score": 7.6, "reasoning": "Fractional."},
+        ],
+    )
+    deliberator = make_deliberator(tmp_path, deliberation)
+
+    result = deliberator.deliberate("Which pet?", RESPONSES)
+
+    assert [e.score for e in result.evaluation.evaluations] == [10, 1, 7]
+
+
+def test_unanimous_responses_skip_deliberation(tmp_path):
+    deliberator = make_deliberator(tmp_path, DELIBERATION)
+    answer = "The capital of France is Paris, a city on the Seine."
+    responses = [
+        {"agent": "Melchior", "response": answer, "success": True},
+        {"agent": "Balthasar", "response": answer.upper() + "!", "success": True},
+        {"agent": "Casper", "response": answer + " Indeed.", "success": False},
+    ]
+
+    result = deliberator.process_magi_decision("Capital of France?", responses)
+
+    assert result.evaluation.voting_result == "Unanimous"
+    # The most complete of the agreeing responses is kept
+    assert result.final_answer == answer.upper() + "!"
+    assert deliberator.deliberation_llm.calls == 0
+
+
+def test_unanimity_threshold(tmp_path):
+    answer = "one two three four five six seven eight nine ten"
+    responses = [
+        {"agent": "Melchior", "response": answer, "success": True},
+        {"agent": "Balthasar", "response": answer + " eleven", "success": True},
+    ]
+
+    # 8 shared trigrams out of 9
+    assert make_deliberator(
+        tmp_path, DELIBERATION, unanimity_threshold=0.85
+    )._unanimous_decision(responses)
+    assert (
+        make_deliberator(
+            tmp_path, DELIBERATION, unanimity_threshold=0.9
+        )._unanimous_decision(responses)
+        is None
+    )
+    deliberator = make_deliberator(tmp_path, DELIBERATION)
+    assert deliberator._unanimous_decision(RESPONSES) is None
+
+
+def test_fewer_than_two_successes_skip_deliberation(tmp_path):
+    deliberator = make_deliberator(tmp_path, DELIBERATION)
+    failed = [dict(r, success=False) for r in RESPONSES]
+    single = [RESPONSES[0]] + failed[1:]
+
+    none_result = deliberator.process_magi_decision("Which pet?", failed)
+    single_result = deliberator.process_magi_decision("Which pet?", single)
+
+    assert none_result.evaluation.evaluations == []
+    assert none_result.final_answer == "No agent was able to answer the question."
+    assert single_result.final_answer == RESPONSES[0]["response"]
+    assert [e.agent for e in single_result.evaluation.evaluations] == ["Melchior"]
+    assert deliberator.deliberation_llm.calls == 0
+
+
+def test_truncate_keeps_head_and_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "agents.magi_deliberator._get_encoding", lambda model_name: ByteEncoding()
+    )
+    deliberator = make_deliberator(tmp_path, DELIBERATION, max_tokens_per_response=8)
+    text = "abcdefghijklmnopqrst"
+
+    assert deliberator._truncate(text) == "abcdef\n…\nst"
+    assert deliberator._truncate("abcdefgh") == "abcdefgh"
+    # Eight characters but 24 tokens
+    assert "…" in deliberator._truncate("猫" * 8)
+
+
+def test_truncate_without_tokeniser(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "agents.magi_deliberator._get_encoding", lambda model_name: None
+    )
+    deliberator = make_deliberator(tmp_path, DELIBERATION, max_tokens_per_response=8)
+
+    # Estimated at four characters per token
+    assert deliberator._truncate("x" * 32) == "x" * 32
+    assert deliberator._truncate("a" * 24 + "b" * 9) == "a" * 24 + "\n…\n" + "b" * 8
+
+
+class ExactCache:
+    """Response cache stub matching identical questions only."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def lookup(self, namespace, question):
+        return self.entries.get((namespace, question))
+
+    def store(self, namespace, question, value):
+        self.entries[(namespace, question)] = value
+
+
+def test_disabled_cache_deliberates_again(tmp_path):
+    deliberator = make_deliberator(tmp_path, DELIBERATION, response_cache=ExactCache())
+
+    deliberator.process_magi_decision("Which pet?", RESPONSES)
+    deliberator.process_magi_decision("Which pet?", RESPONSES)
+    assert deliberator.deliberation_llm.calls == 1
+
+    deliberator.process_magi_decision("Which pet?", RESPONSES, use_cache=False)
+    asyncio.run(
+        deliberator.aprocess_magi_decision("Which pet?", RESPONSES, use_cache=False)
+    )
+    assert deliberator.deliberation_llm.calls == 3
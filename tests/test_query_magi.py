@@ -0,0 +1,100 @@
+"""
+Tests for querying the MAGI System repeatedly through its synchronous API.
+"""
+
+import asyncio
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append("..")
+from agents import magi_system
+from agents.magi_system import MagiSystem, run_async
+
+ANSWER = json.dumps(
+    {
+        "evaluations": [],
+        "synthesis": "Agreed.",
+        "voting_result": "Unanimous",
+        "final_answer": "Forty-two.",
+    }
+)
+
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible chat endpoint keeping connections alive between requests."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps(
+            {
+                "id": "chatcmpl-test",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "test-model",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": ANSWER},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(tmp_path, monkeypatch) -> ThreadingHTTPServer:
+    """Serve the fake chat endpoint and point the MAGI System at it."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    monkeypatch.setattr(magi_system, "LLM_PROVIDER", "lm_studio")
+    monkeypatch.setattr(magi_system, "LM_STUDIO_URL", base_url)
+    monkeypatch.setattr(magi_system, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(
+        magi_system, "MEMORY_DB_PATH", f"sqlite:///{tmp_path / 'history.db'}"
+    )
+    return server
+
+
+def test_consecutive_queries_reuse_connections(tmp_path, monkeypatch):
+    server = start_server(tmp_path, monkeypatch)
+    try:
+        magi = MagiSystem(enable_search=False, enable_rag=False)
+        for question in ("First question?", "Second question?"):
+            result = magi.query_magi(question)
+            assert all(r["success"] for r in result["agent_responses"]), result
+    finally:
+        server.shutdown()
+
+
+def test_concurrent_queries_on_one_system(tmp_path, monkeypatch):
+    server = start_server(tmp_path, monkeypatch)
+    questions = [f"Question {i}?" for i in range(3)]
+
+    async def ask_all(magi):
+        return await asyncio.gather(*(magi.aquery_magi(q) for q in questions))
+
+    try:
+        magi = MagiSystem(enable_search=False, enable_rag=False)
+        results = run_async(ask_all(magi))
+    finally:
+        server.shutdown()
+
+    assert [r["question"] for r in results] == questions
+    for result in results:
+        assert all(r["success"] for r in result["agent_responses"]), result
+        assert result["final_answer"]
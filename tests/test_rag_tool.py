@@ -0,0 +1,58 @@
+"""
+Tests for sharing RAG tools between agents.
+"""
+
+import sys
+
+import pytest
+
+sys.path.append("..")
+from tools import rag_tool
+
+
+class FakeRAGTool:
+    """RAG tool whose vector store opens only once documents are ingested."""
+
+    ingested = False
+
+    def __init__(self, **kwargs):
+        self.vectorstore = object() if FakeRAGTool.ingested else None
+
+
+def test_tools_are_shared_until_closed(monkeypatch):
+    close_all = rag_tool.RAGTool.close_all
+    monkeypatch.setattr(rag_tool, "RAGTool", FakeRAGTool)
+    monkeypatch.setattr(FakeRAGTool, "ingested", True)
+    close_all()
+
+    first = rag_tool._get_shared_rag("collection", "dir", "model")
+    assert rag_tool._get_shared_rag("collection", "dir", "model") is first
+    assert rag_tool._get_shared_rag("other", "dir", "model") is not first
+
+    close_all()
+    assert rag_tool._get_shared_rag("collection", "dir", "model") is not first
+
+
+def test_failed_vector_store_is_retried(monkeypatch):
+    close_all = rag_tool.RAGTool.close_all
+    monkeypatch.setattr(rag_tool, "RAGTool", FakeRAGTool)
+    close_all()
+
+    unavailable = rag_tool._get_shared_rag("collection", "dir", "model")
+    assert unavailable.vectorstore is None
+
+    monkeypatch.setattr(FakeRAGTool, "ingested", True)
+    available = rag_tool._get_shared_rag("collection", "dir", "model")
+    assert available.vectorstore is not None
+    assert rag_tool._get_shared_rag("collection", "dir", "model") is available
+
+
+def test_unavailable_local_model_is_not_replaced(monkeypatch):
+    def fail(*args, **kwargs):
+        raise ImportError("Local embeddings require sentence-transformers")
+
+    monkeypatch.setattr(rag_tool, "RAG_LOCAL_EMBEDDINGS", True)
+    monkeypatch.setattr(rag_tool, "LocalEmbeddings", fail)
+
+    with pytest.raises(ImportError):
+        rag_tool.RAGTool()
@@ -0,0 +1,68 @@
+"""
+Tests for the semantic response cache.
+"""
+
+import sys
+
+sys.path.append("..")
+from agents.response_cache import ProximityCache
+
+
+class KeywordEmbeddings:
+    """Fake embeddings placing queries about dogs and cats on orthogonal axes."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [1.0, 0.0] if "dog" in text else [0.0, 1.0]
+
+
+class FailingEmbeddings:
+    def embed_query(self, text):
+        raise ConnectionError("LM Studio not running")
+
+
+def test_similar_query_hits_cache():
+    cache = ProximityCache(KeywordEmbeddings())
+    cache.store("MELCHIOR", "Should I get a dog?", {"response": "Yes"})
+
+    assert cache.lookup("MELCHIOR", "Should I get a dog?") == {"response": "Yes"}
+    assert cache.lookup("MELCHIOR", "Is a dog a good idea?") == {"response": "Yes"}
+    assert cache.lookup("MELCHIOR", "Should I get a cat?") is None
+
+
+def test_namespaces_are_isolated():
+    cache = ProximityCache(KeywordEmbeddings())
+    cache.store("MELCHIOR", "Should I get a dog?", {"response": "Yes"})
+
+    assert cache.lookup("CASPER", "Should I get a dog?") is None
+
+
+def test_query_is_embedded_once():
+    embeddings = KeywordEmbeddings()
+    cache = ProximityCache(embeddings)
+    for agent in ["MELCHIOR", "BALTHASAR", "CASPER"]:
+        cache.store(agent, "Should I get a dog?", {"response": agent})
+
+    assert embeddings.calls == 1
+
+
+def test_capacity_evicts_least_recently_used():
+    cache = ProximityCache(capacity=2)
+    cache.store("MELCHIOR", "first", 1)
+    cache.store("MELCHIOR", "second", 2)
+    cache.lookup("MELCHIOR", "first")
+    cache.store("MELCHIOR", "third", 3)
+
+    assert cache.lookup("MELCHIOR", "first") == 1
+    assert cache.lookup("MELCHIOR", "second") is None
+
+
+def test_embedding_failure_falls_back_to_exact_match():
+    cache = ProximityCache(FailingEmbeddings())
+    cache.store("MELCHIOR", "Should I get a dog?", {"response": "Yes"})
+
+    assert cache.lookup("MELCHIOR", "Should I get a dog?") == {"response": "Yes"}
+    assert cache.lookup("MELCHIOR", "Is a dog a good idea?") is None
@@ -0,0 +1,74 @@
+"""
+Tests for the markdown helpers of the Streamlit web interface.
+"""
+
+import sys
+
+sys.path.append("..")
+from markdown_it import MarkdownIt
+
+import streamlit_app
+
+CODE_ANSWER = "Try this:\n\n```python\nimport os\n\n# configure\nx = 1\n```\n\nDone."
+
+
+def test_rendered_html_survives_streamlit_markdown():
+    html = streamlit_app.render_md(CODE_ANSWER)
+    wrapped = f'<div class="agent-response">{html}</div>'
+
+    # Streamlit parses HTML passed to st.markdown as CommonMark again
+    for text in (html, wrapped):
+        tokens = MarkdownIt("commonmark").parse(text)
+        assert {token.type for token in tokens} == {"html_block"}
+    assert "import os&#10;&#10;# configure&#10;x = 1" in html
+
+
+class FakeContainer:
+    """Streamlit container stub recording what is written to it."""
+
+    def __init__(self):
+        self.written = []
+
+    def markdown(self, body, unsafe_allow_html=False):
+        self.written.append(body)
+
+    def container(self):
+        return FakeContainer()
+
+    empty = container
+
+
+def test_list_continuation_is_not_split():
+    blocks, trailing = streamlit_app.split_markdown_blocks(
+        "1. First\n\n   More about it\n\n2. Second\n"
+    )
+
+    assert blocks == ["1. First\n\n   More about it\n\n"]
+    assert trailing == "2. Second\n"
+
+
+def test_tilde_fence_is_not_split():
+    blocks, trailing = streamlit_app.split_markdown_blocks(
+        "~~~\nimport os\n\nx = 1\n~~~\nAfter"
+    )
+
+    assert blocks == ["~~~\nimport os\n\nx = 1\n~~~\n"]
+    assert trailing == "After"
+
+
+def test_longer_fence_ends_at_matching_marker():
+    blocks, trailing = streamlit_app.split_markdown_blocks(
+        "````markdown\n```\n\ncode\n```\n````\n\nEnd\n"
+    )
+
+    assert blocks == ["````markdown\n```\n\ncode\n```\n````\n\n"]
+    assert trailing == "End\n"
+
+
+def test_streamed_text_ends_with_a_full_render(monkeypatch):
+    monkeypatch.setattr(streamlit_app, "STREAM_INTERVAL", 0)
+    container = FakeContainer()
+
+    streamlit_app.stream_text(CODE_ANSWER, container, delay=0.0001)
+
+    assert container.written == [streamlit_app.render_md(CODE_ANSWER)]
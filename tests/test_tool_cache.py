@@ -0,0 +1,77 @@
+"""
+Tests for the shared tool cache.
+"""
+
+import asyncio
+import sys
+
+sys.path.append("..")
+from langchain_core.tools import Tool
+
+from tools.tool_cache import SharedToolCache
+
+
+class CountingSearch:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, query):
+        self.calls += 1
+        return f"results for {query}"
+
+
+def test_identical_calls_run_once():
+    search = CountingSearch()
+    cache = SharedToolCache()
+    tool = Tool(name="search", description="search", func=search)
+    agent_tools = [cache.wrap(tool) for _ in range(3)]
+
+    results = [t.invoke("dogs") for t in agent_tools]
+
+    assert results == ["results for dogs"] * 3
+    assert search.calls == 1
+
+
+def test_different_arguments_are_not_shared():
+    search = CountingSearch()
+    cache = SharedToolCache()
+    tool = cache.wrap(Tool(name="search", description="search", func=search))
+
+    tool.invoke("dogs")
+    tool.invoke("cats")
+
+    assert search.calls == 2
+
+
+def test_clear_forgets_results():
+    search = CountingSearch()
+    cache = SharedToolCache()
+    tool = cache.wrap(Tool(name="search", description="search", func=search))
+
+    tool.invoke("dogs")
+    cache.clear()
+    tool.invoke("dogs")
+
+    assert search.calls == 2
+
+
+def test_concurrent_questions_keep_their_own_results():
+    search = CountingSearch()
+    cache = SharedToolCache()
+    tool = cache.wrap(Tool(name="search", description="search", func=search))
+
+    async def answer(question_started, other_started):
+        cache.new_question()
+        await asyncio.to_thread(tool.invoke, "dogs")
+        question_started.set()
+        await other_started.wait()
+        # Starting the other question must not forget this one's results
+        await asyncio.to_thread(tool.invoke, "dogs")
+
+    async def main():
+        first, second = asyncio.Event(), asyncio.Event()
+        await asyncio.gather(answer(first, second), answer(second, first))
+
+    asyncio.run(main())
+
+    assert search.calls == 2
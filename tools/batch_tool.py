@@ -0,0 +1,93 @@
+"""
+Batch tool for MAGI agents.
+Lets an agent run several independent tool lookups concurrently in a single call.
+"""
+
+from typing import List
+
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from langchain_core.tools import BaseTool, StructuredTool
+from pydantic import BaseModel, Field
+
+
+class ToolInvocation(BaseModel):
+    """A single lookup to run as part of a batch."""
+
+    tool_name: str = Field(description="Name of the tool to call")
+    query: str = Field(description="Input query for the tool")
+
+
+class BatchToolsInput(BaseModel):
+    """Input schema for the batch tool."""
+
+    invocations: List[ToolInvocation] = Field(
+        description="Independent tool calls to run at the same time"
+    )
+
+
+def get_batch_tool(tools: List[BaseTool]) -> StructuredTool:
+    """
+    Create a tool that runs several calls to the given tools concurrently.
+
+    Args:
+        tools: Tools that can be called through the batch tool
+
+    Returns:
+        StructuredTool object for agent use
+    """
+    tools_by_name = {t.name: t for t in tools}
+
+    def run_invocation(invocation: ToolInvocation) -> str:
+        tool = tools_by_name.get(invocation.tool_name)
+        if tool is None:
+            return f"[{invocation.tool_name}] Error: Unknown tool."
+        try:
+            result = tool.invoke(invocation.query)
+        except Exception as e:
+            result = f"Error: {str(e)}"
+        return f"[{invocation.tool_name}: {invocation.query}]\n{result}"
+
+    def prefetch(invocations: List[ToolInvocation]):
+        """
+        Let tools that support it prepare all of their queries in one request
+        (e.g. embedding all knowledge base queries at once) before they run.
+        """
+        queries_by_tool = {}
+        for invocation in invocations:
+            queries_by_tool.setdefault(invocation.tool_name, []).append(
+                invocation.query
+            )
+        for name, queries in queries_by_tool.items():
+            tool = tools_by_name.get(name)
+            func = (tool.metadata or {}).get("prefetch") if tool else None
+            if func is None or len(queries) < 2:
+                continue
+            try:
+                func(list(dict.fromkeys(queries)))
+            except Exception:
+                pass  # Each call then prepares its own query
+
+    def batch_tools(invocations: List[ToolInvocation]) -> str:
+        if not invocations:
+            return "No tool calls were given."
+
+        invocations = [
+            i if isinstance(i, ToolInvocation) else ToolInvocation(**i)
+            for i in invocations
+        ]
+        prefetch(invocations)
+        # Copies the caller's context into each thread, as the tool cache needs it
+        with ContextThreadPoolExecutor(max_workers=len(invocations)) as executor:
+            results = executor.map(run_invocation, invocations)
+        return "\n\n".join(results)
+
+    return StructuredTool.from_function(
+        func=batch_tools,
+        name="batch_tools",
+        description=(
+            "Run several independent tool calls at the same time and return all "
+            "results. Use this instead of calling tools one by one when you need "
+            f"more than one lookup. Available tools: {', '.join(tools_by_name)}."
+        ),
+        args_schema=BatchToolsInput,
+    )
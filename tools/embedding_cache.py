@@ -0,0 +1,120 @@
+"""
+Persistent embedding cache for the MAGI RAG tool.
+Stores embeddings in SQLite so that text seen in previous sessions is never re-embedded.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper caching vectors in memory (LRU) and in a SQLite database.
+
+    Entries are keyed by a hash of the model name and the text, so changing the
+    embedding model never returns vectors from the previous one.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        db_path: str,
+        capacity: int = 2048,
+    ):
+        """
+        Initialise the cache.
+
+        Args:
+            embeddings: LangChain embeddings object computing cache misses
+            model_name: Name of the embedding model, part of every cache key
+            db_path: Path of the SQLite database file
+            capacity: Maximum number of embeddings kept in memory (LRU eviction)
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.capacity = capacity
+
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(hash TEXT PRIMARY KEY, model TEXT, vec BLOB)"
+        )
+        self._connection.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode()).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return the cached vectors among the given keys, from memory or disk."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+
+            missing = [k for k in keys if k not in found]
+            if missing:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._connection.execute(
+                    f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})",
+                    missing,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    self._remember(key, vector)
+                    found[key] = vector
+        return found
+
+    def _store(self, items: Dict[str, List[float]]):
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, model, vec) VALUES (?, ?, ?)",
+                [
+                    (key, self.model_name, array("f", vector).tobytes())
+                    for key, vector in items.items()
+                ],
+            )
+            self._connection.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, computing all cache misses in a single embedding call."""
+        keys = [self._key(t) for t in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        misses = {k: t for k, t in zip(keys, texts) if k not in found}
+        if misses:
+            vectors = self.embeddings.embed_documents(list(misses.values()))
+            computed = dict(zip(misses.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing a cached vector when available."""
+        key = self._key(text)
+        found = self._lookup([key])
+        if key in found:
+            return found[key]
+
+        vector = self.embeddings.embed_query(text)
+        self._store({key: vector})
+        return vector
@@ -0,0 +1,158 @@
+"""
+In-process embeddings for the MAGI RAG tool.
+Runs a sentence-transformers model locally instead of calling LM Studio over HTTP.
+"""
+
+import os
+import platform
+from functools import lru_cache
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from config import RAG_LOCAL_EMBEDDING_CACHE_DIR
+
+
+def _quantization_config() -> str:
+    """
+    Return the sentence-transformers int8 quantization config suiting this CPU
+    ("arm64", "avx512_vnni", "avx512" or "avx2").
+    """
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+
+    # CPU features are only listed on Linux; avx2 runs on any recent x86 CPU
+    flags = set()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags = set(line.split(":", 1)[1].split())
+                    break
+    except OSError:
+        pass
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def _int8_model(model_name: str, device: str):
+    """
+    Load the dynamically quantized ONNX export of a model for this CPU. Models that
+    don't publish one are quantized locally once, and saved for later runs.
+    """
+    from sentence_transformers import (
+        SentenceTransformer,
+        export_dynamic_quantized_onnx_model,
+    )
+
+    config = _quantization_config()
+    file_name = f"onnx/model_qint8_{config}.onnx"
+    try:
+        return SentenceTransformer(
+            model_name,
+            device=device,
+            backend="onnx",
+            model_kwargs={"file_name": file_name},
+        )
+    except Exception:
+        pass
+
+    local_path = os.path.join(
+        RAG_LOCAL_EMBEDDING_CACHE_DIR, model_name.replace("/", "--")
+    )
+    if not os.path.exists(os.path.join(local_path, file_name)):
+        print(f"Quantizing {model_name} to int8 ({config}), once...")
+        model = SentenceTransformer(model_name, device=device, backend="onnx")
+        model.save(local_path)
+        export_dynamic_quantized_onnx_model(model, config, local_path)
+    return SentenceTransformer(
+        local_path,
+        device=device,
+        backend="onnx",
+        model_kwargs={"file_name": file_name},
+    )
+
+
+@lru_cache(maxsize=2)
+def _load_model(model_name: str, device: str, precision: str = "fp32"):
+    """
+    Load a sentence-transformers model, once per process.
+    Returns the model and the precision it actually runs at, as a model that can't
+    be run in int8 (e.g. without ONNX Runtime) falls back to fp32.
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError(
+            "Local embeddings require sentence-transformers: "
+            'pip install -e ".[local]"'
+        ) from e
+
+    if precision == "int8":
+        try:
+            return _int8_model(model_name, device), precision
+        except Exception as e:
+            print(f"Warning: Could not quantize {model_name} to int8, using fp32: {e}")
+            precision = "fp32"
+
+    model = SentenceTransformer(model_name, device=device)
+    if precision == "fp16":
+        if device == "cpu":
+            # Half precision is slower than fp32 on most CPUs
+            precision = "fp32"
+        else:
+            model = model.half()
+    return model, precision
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    LangChain embeddings computed in-process by a sentence-transformers model.
+
+    The model is loaded once per process and shared by all instances, so that
+    every agent's RAG tool can use it without loading it again.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str = "cpu",
+        precision: str = "fp32",
+        batch_size: int = 32,
+    ):
+        """
+        Initialise the embeddings, loading the model if needed.
+
+        Args:
+            model_name: Name or path of the sentence-transformers model
+            device: Device running the model (e.g. "cpu", "cuda")
+            precision: "fp32", "fp16" (GPU only) or "int8" (quantized ONNX model)
+            batch_size: Number of texts encoded at once
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model, self.precision = _load_model(model_name, device, precision)
+
+    @property
+    def model_id(self) -> str:
+        """Identify the model and precision, as vectors differ between precisions."""
+        if self.precision == "fp32":
+            return self.model_name
+        return f"{self.model_name}:{self.precision}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in batches."""
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query."""
+        return self.embed_documents([text])[0]
@@ -3,18 +3,30 @@ RAG (Retrieval-Augmented Generation) tool for MAGI agents.
 Uses ChromaDB for vector storage and LM Studio for embeddings.
 """
 
+import threading
+from typing import List
+
 from langchain_core.tools import Tool
 from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
 
+from agents.llm import get_http_clients
 from config import (
     LM_STUDIO_API_KEY,
     LM_STUDIO_URL,
     RAG_COLLECTION_NAME,
+    RAG_EMBEDDING_CACHE_PATH,
     RAG_EMBEDDING_MODEL,
+    RAG_HNSW_METADATA,
+    RAG_LOCAL_EMBEDDING_DEVICE,
+    RAG_LOCAL_EMBEDDING_MODEL,
+    RAG_LOCAL_EMBEDDING_PRECISION,
+    RAG_LOCAL_EMBEDDINGS,
     RAG_PERSIST_DIR,
     RAG_SEARCH_K,
 )
+from tools.embedding_cache import CachedEmbeddings
+from tools.local_embeddings import LocalEmbeddings
 
 
 class RAGTool:
@@ -39,17 +51,42 @@ class RAGTool:
             embedding_model: Name of the embedding model to use
             embedding_base_url: Base URL for embeddings (defaults to LM Studio)
             embedding_api_key: API key for embeddings (defaults to LM Studio)
+
+        Raises:
+            Exception: If the local embedding model is configured but can't be loaded
         """
         self.collection_name = collection_name
         self.persist_directory = persist_directory
 
-        # Initialise embeddings with LM Studio
-        self.embeddings = OpenAIEmbeddings(
-            model=embedding_model,
-            base_url=embedding_base_url,
-            api_key=embedding_api_key,
-            check_embedding_ctx_length=False,
-        )
+        # Initialise embeddings in-process if configured, or with LM Studio, cached
+        # across sessions. There is no fallback from the local model, as the
+        # documents were ingested with it and other vectors wouldn't match them.
+        if RAG_LOCAL_EMBEDDINGS:
+            self.embeddings = LocalEmbeddings(
+                RAG_LOCAL_EMBEDDING_MODEL,
+                device=RAG_LOCAL_EMBEDDING_DEVICE,
+                precision=RAG_LOCAL_EMBEDDING_PRECISION,
+            )
+            embedding_model = self.embeddings.model_id
+        else:
+            # Keep-alive connections shared with the chat models
+            http_client, http_async_client = get_http_clients(embedding_base_url)
+            self.embeddings = OpenAIEmbeddings(
+                model=embedding_model,
+                base_url=embedding_base_url,
+                api_key=embedding_api_key,
+                check_embedding_ctx_length=False,
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+        try:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                model_name=embedding_model,
+                db_path=RAG_EMBEDDING_CACHE_PATH,
+            )
+        except Exception as e:
+            print(f"Warning: Could not open embedding cache: {e}")
 
         # Initialise ChromaDB vector store
         try:
@@ -57,6 +94,7 @@ class RAGTool:
                 collection_name=collection_name,
                 embedding_function=self.embeddings,
                 persist_directory=persist_directory,
+                collection_metadata=RAG_HNSW_METADATA,
             )
         except Exception as e:
             print(f"Warning: Could not initialise ChromaDB: {e}")
@@ -79,24 +117,39 @@ class RAGTool:
         try:
             # Perform similarity search
             docs = self.vectorstore.similarity_search(query, k=k)
-
-            if not docs:
-                return "No relevant documents found in the knowledge base."
-
-            # Format results
-            results = []
-            for i, doc in enumerate(docs, 1):
-                metadata = doc.metadata
-                source = metadata.get("source", "Unknown")
-                content = doc.page_content
-
-                results.append(f"[Document {i} - Source: {source}]\n{content}\n")
-
-            return "\n".join(results)
+            return self._format_results(docs)
 
         except Exception as e:
             return f"Error searching knowledge base: {str(e)}"
 
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed several queries in a single request. With the embedding cache, later
+        searches for these queries reuse the vectors instead of embedding them again.
+        """
+        return self.embeddings.embed_documents(list(dict.fromkeys(queries)))
+
+    @staticmethod
+    def _format_results(docs) -> str:
+        """Format retrieved documents for the agent."""
+        if not docs:
+            return "No relevant documents found in the knowledge base."
+
+        return "\n".join(
+            f"[Document {i} - Source: {doc.metadata.get('source', 'Unknown')}]\n"
+            f"{doc.page_content}\n"
+            for i, doc in enumerate(docs, 1)
+        )
+
+    @staticmethod
+    def close_all():
+        """
+        Forget the RAG tools shared by agents, so that the next ones reopen the
+        vector store (e.g. after documents were ingested by another process).
+        """
+        with _shared_lock:
+            _shared_rags.clear()
+
     def create_tool(self) -> Tool:
         """
         Create a LangChain Tool for use with agents.
@@ -112,6 +165,8 @@ class RAGTool:
                 "previously ingested documents. Input should be a search query."
             ),
             func=self.search,
+            # Lets the batch tool embed all of its knowledge base queries at once
+            metadata={"prefetch": self.embed_queries},
         )
 
 
@@ -131,9 +186,32 @@ def get_rag_tool(
     Returns:
         Configured Tool object
     """
-    rag = RAGTool(
-        collection_name=collection_name,
-        persist_directory=persist_directory,
-        embedding_model=embedding_model,
-    )
+    rag = _get_shared_rag(collection_name, persist_directory, embedding_model)
     return rag.create_tool()
+
+
+# RAG tools shared by agents, by collection, persist directory and embedding model
+_shared_rags = {}
+_shared_lock = threading.Lock()
+
+
+def _get_shared_rag(
+    collection_name: str, persist_directory: str, embedding_model: str
+) -> RAGTool:
+    """
+    Return the RAG tool for a collection, created once per process so that all
+    agents share its vector store, embeddings and query cache.
+    A tool whose vector store failed to open is not kept, so the next call retries.
+    """
+    key = (collection_name, persist_directory, embedding_model)
+    with _shared_lock:
+        rag = _shared_rags.get(key)
+        if rag is None:
+            rag = RAGTool(
+                collection_name=collection_name,
+                persist_directory=persist_directory,
+                embedding_model=embedding_model,
+            )
+            if rag.vectorstore is not None:
+                _shared_rags[key] = rag
+        return rag
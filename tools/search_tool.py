@@ -0,0 +1,28 @@
+"""
+Web search tool for MAGI agents.
+Uses DuckDuckGo, shared by all agents of the process.
+"""
+
+from functools import lru_cache
+
+from langchain_community.tools import DuckDuckGoSearchRun
+from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+
+from config import MAX_SEARCH_RESULTS
+
+
+@lru_cache(maxsize=None)
+def get_search_tool(max_results: int = MAX_SEARCH_RESULTS) -> DuckDuckGoSearchRun:
+    """
+    Helper function to retrieve the DuckDuckGo search tool.
+    A single instance is shared so that agents reuse its search client.
+
+    Args:
+        max_results: Number of search results to return per query
+
+    Returns:
+        Configured DuckDuckGoSearchRun tool
+    """
+    return DuckDuckGoSearchRun(
+        api_wrapper=DuckDuckGoSearchAPIWrapper(max_results=max_results)
+    )
@@ -0,0 +1,98 @@
+"""
+Shared tool result cache for MAGI agents.
+Lets agents answering the same question reuse each other's search and RAG results.
+"""
+
+import json
+import threading
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langchain_core.tools import BaseTool
+
+
+class SharedToolCache:
+    """
+    Memoises tool results by tool name and arguments for the current question.
+
+    Identical calls made while the first one is still running wait for its result
+    instead of calling the tool again. new_question() should be called before each
+    question so that agents never see stale results. Results are kept per question
+    in a context variable, so questions answered concurrently (e.g. in separate
+    asyncio tasks) neither share nor clear each other's results.
+    """
+
+    def __init__(self):
+        # Results of the question answered in the current context, if one was started
+        self._question: ContextVar[Optional[Dict[Tuple[str, str], Future]]] = (
+            ContextVar("tool_cache_question", default=None)
+        )
+        # Results of calls made outside of any question
+        self._results: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def new_question(self):
+        """
+        Start caching results for a new question in the current context. Tasks and
+        threads answering it must run in copies of this context (asyncio tasks,
+        asyncio.to_thread() and LangChain's ContextThreadPoolExecutor copy it).
+        """
+        self._question.set({})
+
+    def _current_results(self) -> Dict[Tuple[str, str], Future]:
+        """Return the results of the current question."""
+        results = self._question.get()
+        return self._results if results is None else results
+
+    def run(self, tool_name: str, arguments: Any, func: Callable[[], Any]) -> Any:
+        """Return the cached result for a tool call, running func on a miss."""
+        key = (tool_name, json.dumps(arguments, sort_keys=True, default=str))
+        results = self._current_results()
+
+        with self._lock:
+            future = results.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                results[key] = future
+
+        if is_owner:
+            try:
+                future.set_result(func())
+            except Exception as e:
+                # Don't cache failures; the next caller retries the tool
+                with self._lock:
+                    results.pop(key, None)
+                future.set_exception(e)
+
+        return future.result()
+
+    def wrap(self, tool: BaseTool) -> BaseTool:
+        """Return a copy of the tool whose calls go through this cache."""
+        return CachedTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            metadata=tool.metadata,
+            tool=tool,
+            cache=self,
+        )
+
+    def clear(self):
+        """Remove the cached results of the current question."""
+        with self._lock:
+            self._current_results().clear()
+
+
+class CachedTool(BaseTool):
+    """Tool delegating to another tool through a SharedToolCache."""
+
+    tool: BaseTool
+    cache: SharedToolCache
+
+    def _run(self, *args, **kwargs) -> Any:
+        tool_input = kwargs if kwargs else args[0]
+        return self.cache.run(
+            self.tool.name, tool_input, lambda: self.tool.invoke(tool_input)
+        )